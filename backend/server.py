@@ -1,25 +1,43 @@
-from fastapi import FastAPI, APIRouter, HTTPException, Depends, UploadFile, File, Form
+from fastapi import FastAPI, APIRouter, HTTPException, Depends, UploadFile, File, Form, Query, Request, Response
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
-from fastapi.responses import FileResponse, StreamingResponse
+from fastapi.responses import FileResponse, ORJSONResponse, StreamingResponse
 from dotenv import load_dotenv
 from starlette.middleware.cors import CORSMiddleware
 from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import ASCENDING, IndexModel, InsertOne, ReturnDocument, UpdateOne
+from pymongo.errors import DuplicateKeyError, OperationFailure, PyMongoError
 import os
+import asyncio
 import logging
 from pathlib import Path
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, Field, create_model, field_validator
 from typing import List, Optional, Dict, Any
 import uuid
-from datetime import datetime, timedelta
+from datetime import date, datetime, timedelta, timezone, time as dt_time
+from email.utils import format_datetime, parsedate_to_datetime
 import jwt
 import hashlib
+import numpy as np
 import pandas as pd
 import openpyxl
 from openpyxl import Workbook
 from openpyxl.styles import Font, PatternFill, Alignment
+from openpyxl.utils import get_column_letter
 import io
 import base64
+import orjson
+import re
+import csv
+import shutil
+import tempfile
+import time
+import functools
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from collections import Counter, OrderedDict
+from itertools import chain, islice, repeat
 from enum import Enum
+from zoneinfo import ZoneInfo
 
 
 ROOT_DIR = Path(__file__).parent
@@ -31,7 +49,7 @@ client = AsyncIOMotorClient(mongo_url)
 db = client[os.environ['DB_NAME']]
 
 # Create the main app without a prefix
-app = FastAPI()
+app = FastAPI(default_response_class=ORJSONResponse)
 
 # Create a router with the /api prefix
 api_router = APIRouter(prefix="/api")
@@ -43,6 +61,106 @@ ACCESS_TOKEN_EXPIRE_MINUTES = 30
 
 security = HTTPBearer()
 
+# Principal cache: authenticated users are kept in memory for a short while so
+# that get_current_user does not hit Mongo on every request. Entries remember
+# the "principals" dataset version they were loaded at; any worker changing a
+# user bumps it, so other workers drop stale entries within the version TTL.
+PRINCIPALS_DATASET = "principals"
+PRINCIPAL_CACHE_TTL_SECONDS = float(os.environ.get('PRINCIPAL_CACHE_TTL_SECONDS', 60))
+PRINCIPAL_CACHE_MAX_ENTRIES = int(os.environ.get('PRINCIPAL_CACHE_MAX_ENTRIES', 10000))
+
+class TTLCache:
+    def __init__(self, maxsize: int, ttl: float):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data: "OrderedDict[Any, tuple]" = OrderedDict()
+
+    def get(self, key, default=None):
+        entry = self._data.get(key)
+        if entry is None:
+            return default
+        expires_at, value = entry
+        if expires_at < time.monotonic():
+            self._data.pop(key, None)
+            return default
+        self._data.move_to_end(key)
+        return value
+
+    def set(self, key, value):
+        self._data[key] = (time.monotonic() + self.ttl, value)
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+    def pop(self, key):
+        self._data.pop(key, None)
+
+    def clear(self):
+        self._data.clear()
+
+principal_cache = TTLCache(PRINCIPAL_CACHE_MAX_ENTRIES, PRINCIPAL_CACHE_TTL_SECONDS)
+
+# Executors for blocking work. Handlers must not call Excel parsing/rendering
+# or password hashing directly: run_blocking sends work to a thread pool and
+# run_cpu_bound to a process pool when EXECUTOR_PROCESSES > 0 (module-level,
+# picklable functions only), or to the thread pool otherwise.
+EXECUTOR_THREADS = int(os.environ.get('EXECUTOR_THREADS', min(32, (os.cpu_count() or 1) + 4)))
+EXECUTOR_PROCESSES = int(os.environ.get('EXECUTOR_PROCESSES', 0))
+
+class BlockingExecutor:
+    def __init__(self, name: str, executor, max_workers: int):
+        self.name = name
+        self.executor = executor
+        self.max_workers = max_workers
+        self.in_flight = 0
+        self.completed = 0
+        self.failed = 0
+
+    async def run(self, fn, *args, **kwargs):
+        loop = asyncio.get_running_loop()
+        self.in_flight += 1
+        try:
+            result = await loop.run_in_executor(self.executor, functools.partial(fn, *args, **kwargs))
+        except Exception:
+            self.failed += 1
+            raise
+        finally:
+            self.in_flight -= 1
+        self.completed += 1
+        return result
+
+    def metrics(self) -> dict:
+        return {
+            "name": self.name,
+            "max_workers": self.max_workers,
+            "in_flight": self.in_flight,
+            "queue_depth": max(self.in_flight - self.max_workers, 0),
+            "completed": self.completed,
+            "failed": self.failed,
+        }
+
+    def shutdown(self):
+        self.executor.shutdown(wait=False, cancel_futures=True)
+
+thread_executor = BlockingExecutor(
+    "threads", ThreadPoolExecutor(max_workers=EXECUTOR_THREADS, thread_name_prefix="blocking"), EXECUTOR_THREADS
+)
+process_executor = BlockingExecutor(
+    "processes",
+    ProcessPoolExecutor(max_workers=EXECUTOR_PROCESSES, mp_context=multiprocessing.get_context("spawn")),
+    EXECUTOR_PROCESSES
+) if EXECUTOR_PROCESSES > 0 else None
+
+async def run_blocking(fn, *args, **kwargs):
+    return await thread_executor.run(fn, *args, **kwargs)
+
+async def run_cpu_bound(fn, *args, **kwargs):
+    executor = process_executor or thread_executor
+    return await executor.run(fn, *args, **kwargs)
+
+def executor_metrics() -> list:
+    return [executor.metrics() for executor in (thread_executor, process_executor) if executor]
+
 # Enums
 class UserRole(str, Enum):
     ADMIN = "admin"
@@ -63,6 +181,53 @@ class DayOfWeek(str, Enum):
     SATURDAY = "saturday"
     SUNDAY = "sunday"
 
+# Schedule times are stored as minutes since midnight in a 7x4 "shifts" array
+# (one row per day: start, break start, break end, end) and exposed through
+# the API as the 28 "HH:MM" fields of the Schedule model
+DAYS = [day.value for day in DayOfWeek]
+SHIFT_POINTS = ["start", "break_start", "break_end", "end"]
+SCHEDULE_TIME_FIELDS = [f"{day}_{point}" for day in DAYS for point in SHIFT_POINTS]
+# Time field -> (day index, point index) in the shifts array
+SCHEDULE_TIME_POSITIONS = {
+    f"{day}_{point}": (day_index, point_index)
+    for day_index, day in enumerate(DAYS)
+    for point_index, point in enumerate(SHIFT_POINTS)
+}
+MINUTES_PER_DAY = 24 * 60
+# Optional date prefix (Excel datetimes), HH:MM, optional seconds
+TIME_PATTERN = r"^(?:\d{4}-\d{2}-\d{2}[ T])?(\d{1,2}):(\d{2})(?::\d{2}(?:\.\d+)?)?$"
+EMPTY_CELL_VALUES = ["", "nan", "NaT", "None"]
+
+def parse_time_minutes(value) -> Optional[int]:
+    if value is None:
+        return None
+    if isinstance(value, dt_time):
+        return value.hour * 60 + value.minute
+    text = str(value).strip()
+    if text in EMPTY_CELL_VALUES:
+        return None
+    match = re.match(TIME_PATTERN, text)
+    if not match or int(match.group(2)) >= 60:
+        raise ValueError(f"Invalid time '{text}', expected HH:MM")
+    minutes = int(match.group(1)) * 60 + int(match.group(2))
+    if minutes > MINUTES_PER_DAY:
+        raise ValueError(f"Invalid time '{text}', expected HH:MM")
+    return minutes
+
+def parse_time_or_none(value) -> Optional[int]:
+    try:
+        return parse_time_minutes(value)
+    except ValueError:
+        return None
+
+def format_minutes(minutes: Optional[int]) -> Optional[str]:
+    if minutes is None:
+        return None
+    return f"{minutes // 60:02d}:{minutes % 60:02d}"
+
+# "HH:MM" label of every stored minute value, for fast document views
+TIME_LABELS = [format_minutes(minutes) for minutes in range(MINUTES_PER_DAY + 1)]
+
 # Models
 class User(BaseModel):
     id: str = Field(default_factory=lambda: str(uuid.uuid4()))
@@ -91,6 +256,10 @@ class Token(BaseModel):
     token_type: str
     user: User
 
+class StreamToken(BaseModel):
+    token: str
+    expires_in: int
+
 class Schedule(BaseModel):
     id: str = Field(default_factory=lambda: str(uuid.uuid4()))
     user_id: str
@@ -125,6 +294,75 @@ class Schedule(BaseModel):
     sunday_end: Optional[str] = None
     created_at: datetime = Field(default_factory=datetime.utcnow)
 
+    @field_validator(*SCHEDULE_TIME_FIELDS, mode="before")
+    @classmethod
+    def normalize_time(cls, value):
+        return format_minutes(parse_time_minutes(value))
+
+class ScheduleBatchUpdateBase(BaseModel):
+    # Partial update: only the fields sent are changed, null clears a time
+    id: str
+    service: Optional[str] = None
+
+    @field_validator("service")
+    @classmethod
+    def service_not_null(cls, value):
+        if value is None:
+            raise ValueError("service cannot be null")
+        return value
+
+    @field_validator(*SCHEDULE_TIME_FIELDS, mode="before", check_fields=False)
+    @classmethod
+    def normalize_time(cls, value):
+        return format_minutes(parse_time_minutes(value))
+
+ScheduleBatchUpdate = create_model(
+    "ScheduleBatchUpdate",
+    __base__=ScheduleBatchUpdateBase,
+    **{field: (Optional[str], None) for field in SCHEDULE_TIME_FIELDS}
+)
+
+class BatchItemResult(BaseModel):
+    id: str
+    status_code: int
+    detail: Optional[str] = None
+
+class BatchResult(BaseModel):
+    updated: int
+    results: List[BatchItemResult]
+
+def legacy_shifts(document: dict) -> list:
+    # Documents written before the shifts array kept one string per field;
+    # unreadable values are dropped
+    return [
+        [parse_time_or_none(document.get(f"{day}_{point}")) for point in SHIFT_POINTS]
+        for day in DAYS
+    ]
+
+def schedule_document(schedule: Schedule) -> dict:
+    document = schedule.dict(exclude=set(SCHEDULE_TIME_FIELDS))
+    document["shifts"] = [
+        [parse_time_minutes(getattr(schedule, f"{day}_{point}")) for point in SHIFT_POINTS]
+        for day in DAYS
+    ]
+    return document
+
+def schedule_view(document: dict) -> dict:
+    view = {key: value for key, value in document.items() if key not in ("_id", "shifts")}
+    shifts = document.get("shifts") or legacy_shifts(document)
+    view.update(zip(
+        SCHEDULE_TIME_FIELDS,
+        (None if minutes is None else TIME_LABELS[minutes] for minutes in chain.from_iterable(shifts))
+    ))
+    return view
+
+def schedule_from_document(document: dict) -> Schedule:
+    # Stored times are already valid, so the model is built without validation
+    return Schedule.model_construct(**schedule_view(document))
+
+# $unset spec removing the per-field strings once a document has shifts
+LEGACY_TIME_FIELDS_UNSET = {field: "" for field in SCHEDULE_TIME_FIELDS}
+
 class ScheduleRequest(BaseModel):
     id: str = Field(default_factory=lambda: str(uuid.uuid4()))
     employee_id: str
@@ -181,41 +419,343 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
     return encoded_jwt
 
-async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(security)):
+async def user_from_token(token: str, scope: Optional[str] = None) -> User:
     credentials_exception = HTTPException(
         status_code=401,
         detail="Could not validate credentials",
         headers={"WWW-Authenticate": "Bearer"},
     )
     try:
-        payload = jwt.decode(credentials.credentials, SECRET_KEY, algorithms=[ALGORITHM])
+        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
         username: str = payload.get("sub")
-        if username is None:
+        if username is None or payload.get("scope") != scope:
             raise credentials_exception
     except jwt.PyJWTError:
         raise credentials_exception
     
+    dataset = await get_dataset_version(PRINCIPALS_DATASET)
+    cached = principal_cache.get(username)
+    if cached is not None and cached[0] == dataset["version"]:
+        return cached[1]
+    
     user = await db.users.find_one({"username": username})
     if user is None:
         raise credentials_exception
     
-    return User(**user)
+    user_obj = User(**user)
+    principal_cache.set(username, (dataset["version"], user_obj))
+    return user_obj
+
+async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(security)):
+    return await user_from_token(credentials.credentials)
+
+async def invalidate_principal(*usernames: Optional[str]):
+    for username in usernames:
+        if username:
+            principal_cache.pop(username)
+    await bump_dataset_version(PRINCIPALS_DATASET)
 
 async def get_current_active_user(current_user: User = Depends(get_current_user)):
     if not current_user.is_active:
         raise HTTPException(status_code=400, detail="Inactive user")
     return current_user
 
+# Conditional GET: compare an ETag against If-None-Match
+def etag_matches(request: Request, etag: str) -> bool:
+    if_none_match = request.headers.get("if-none-match")
+    if not if_none_match:
+        return False
+    candidates = [candidate.strip().removeprefix("W/") for candidate in if_none_match.split(",")]
+    return "*" in candidates or etag.removeprefix("W/") in candidates
+
+def http_date(value: datetime) -> str:
+    return format_datetime(value.replace(tzinfo=timezone.utc), usegmt=True)
+
+def not_modified_since(request: Request, last_modified: Optional[datetime]) -> bool:
+    # If-None-Match takes precedence over If-Modified-Since
+    if_modified_since = request.headers.get("if-modified-since")
+    if not if_modified_since or not last_modified or "if-none-match" in request.headers:
+        return False
+    try:
+        since = parsedate_to_datetime(if_modified_since)
+    except (TypeError, ValueError):
+        return False
+    if since.tzinfo is None:
+        since = since.replace(tzinfo=timezone.utc)
+    return last_modified.replace(tzinfo=timezone.utc, microsecond=0) <= since
+
+# Dataset versions: one counter per dataset in db.dataset_versions, bumped by
+# every write to it. Reads are cached briefly so hot paths (export cache,
+# reports) rarely query it; other workers observe a bump within the TTL.
+SCHEDULES_DATASET = "schedules"
+DATASET_VERSION_TTL_SECONDS = float(os.environ.get('DATASET_VERSION_TTL_SECONDS', 2))
+dataset_version_cache = TTLCache(64, DATASET_VERSION_TTL_SECONDS)
+
+async def get_dataset_version(name: str) -> dict:
+    dataset = dataset_version_cache.get(name)
+    if dataset is None:
+        document = await db.dataset_versions.find_one({"_id": name})
+        dataset = {
+            "version": document["version"] if document else 0,
+            "updated_at": document["updated_at"] if document else None,
+        }
+        dataset_version_cache.set(name, dataset)
+    return dataset
+
+async def bump_dataset_version(name: str) -> dict:
+    document = await db.dataset_versions.find_one_and_update(
+        {"_id": name},
+        {"$inc": {"version": 1}, "$set": {"updated_at": datetime.utcnow()}},
+        upsert=True,
+        return_document=ReturnDocument.AFTER
+    )
+    dataset = {"version": document["version"], "updated_at": document["updated_at"]}
+    dataset_version_cache.set(name, dataset)
+    return dataset
+
+# Keyset pagination: list endpoints are ordered by (created_at, id) and return
+# the cursor of the next page in the X-Next-Cursor header
+DEFAULT_PAGE_SIZE = 1000
+MAX_PAGE_SIZE = 1000
+PAGINATION_SORT = [("created_at", ASCENDING), ("id", ASCENDING)]
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+def encode_cursor(document: dict) -> str:
+    created_at = document["created_at"].isoformat()
+    raw = f"{created_at}|{document['id']}"
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+def decode_cursor(cursor: str) -> dict:
+    try:
+        created_at, document_id = base64.urlsafe_b64decode(cursor.encode()).decode().split("|", 1)
+        created_at = datetime.fromisoformat(created_at)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    return {"$or": [
+        {"created_at": {"$gt": created_at}},
+        {"created_at": created_at, "id": {"$gt": document_id}},
+    ]}
+
+async def fetch_page(collection, query: dict, limit: int, after: Optional[str], response: Response, projection: Optional[dict] = None) -> List[dict]:
+    if after:
+        query = {"$and": [query, decode_cursor(after)]}
+    documents = await collection.find(query, projection).sort(PAGINATION_SORT).limit(limit + 1).to_list(limit + 1)
+    if len(documents) > limit:
+        documents = documents[:limit]
+        response.headers[NEXT_CURSOR_HEADER] = encode_cursor(documents[-1])
+    return documents
+
+# Trusted reads: list endpoints project Mongo documents down to the response
+# model's fields and serialize them with orjson, instead of validating each
+# document into a model and then again against response_model
+def model_projection(model, *extra_fields: str) -> dict:
+    return {"_id": 0, **{field: 1 for field in chain(model.model_fields, extra_fields)}}
+
+def model_defaults(model) -> dict:
+    return {
+        name: field.default
+        for name, field in model.model_fields.items()
+        if not field.is_required() and field.default_factory is None
+    }
+
+def with_defaults(document: dict, defaults: dict) -> dict:
+    # Older documents may lack fields added to the model since
+    return document if defaults.keys() <= document.keys() else {**defaults, **document}
+
+def document_payload(documents: List[dict], defaults: dict) -> List[dict]:
+    return [with_defaults(document, defaults) for document in documents]
+
+def trusted_response(payload: Any, response: Response) -> ORJSONResponse:
+    # Returning a response directly drops headers set on the injected one
+    headers = {NEXT_CURSOR_HEADER: response.headers[NEXT_CURSOR_HEADER]} if NEXT_CURSOR_HEADER in response.headers else None
+    return ORJSONResponse(payload, headers=headers)
+
+USER_PROJECTION = model_projection(User)
+USER_DEFAULTS = model_defaults(User)
+SCHEDULE_PROJECTION = model_projection(Schedule, "shifts")
+SCHEDULE_DEFAULTS = model_defaults(Schedule)
+SCHEDULE_REQUEST_PROJECTION = model_projection(ScheduleRequest)
+SCHEDULE_REQUEST_DEFAULTS = model_defaults(ScheduleRequest)
+
+def user_payload(document: dict) -> dict:
+    return with_defaults(document, USER_DEFAULTS)
+
+def schedule_payload(document: dict) -> dict:
+    return with_defaults(schedule_view(document), SCHEDULE_DEFAULTS)
+
+# Sparse fieldsets: ?fields=a,b selects response fields and ?day= limits
+# schedules to one day's times. Both map to Mongo projections; the cursor keys
+# are always fetched so pagination keeps working.
+CURSOR_PROJECTION = {"_id": 0, "id": 1, "created_at": 1}
+
+def parse_fields(model, fields: Optional[str]) -> Optional[List[str]]:
+    if fields is None:
+        return None
+    selected = list(dict.fromkeys(field.strip() for field in fields.split(",") if field.strip()))
+    unknown = [field for field in selected if field not in model.model_fields]
+    if unknown or not selected:
+        raise HTTPException(status_code=400, detail=f"Unknown fields: {', '.join(unknown)}" if unknown else "No fields selected")
+    return selected
+
+def sparse_projection(selected: List[str]) -> dict:
+    return {**CURSOR_PROJECTION, **{field: 1 for field in selected}}
+
+def sparse_payload(document: dict, selected: List[str], defaults: dict) -> dict:
+    return {field: document.get(field, defaults.get(field)) for field in selected}
+
+def schedule_fields(fields: Optional[str], day: Optional[DayOfWeek]) -> Optional[List[str]]:
+    selected = parse_fields(Schedule, fields)
+    if day is None:
+        return selected
+    selected = [
+        field for field in selected or Schedule.model_fields
+        if field not in SCHEDULE_TIME_POSITIONS or SCHEDULE_TIME_POSITIONS[field][0] == DAYS.index(day.value)
+    ]
+    if not selected:
+        raise HTTPException(status_code=400, detail="No fields selected")
+    return selected
+
+def schedule_sparse_projection(selected: List[str]) -> tuple:
+    # Returns (projection, index of the first day in the projected shifts).
+    # Selected time fields also project their legacy per-field strings.
+    projection = sparse_projection(selected)
+    days = {SCHEDULE_TIME_POSITIONS[field][0] for field in selected if field in SCHEDULE_TIME_POSITIONS}
+    if len(days) == 1:
+        day_index = days.pop()
+        projection["shifts"] = {"$slice": [day_index, 1]}
+        return projection, day_index
+    if days:
+        projection["shifts"] = 1
+    return projection, 0
+
+def sparse_schedule_view(document: dict, selected: List[str], day_offset: int) -> dict:
+    shifts = document.get("shifts")
+    view = {}
+    for field in selected:
+        position = SCHEDULE_TIME_POSITIONS.get(field)
+        if position is None:
+            view[field] = document.get(field, SCHEDULE_DEFAULTS.get(field))
+        elif shifts:
+            minutes = shifts[position[0] - day_offset][position[1]]
+            view[field] = None if minutes is None else TIME_LABELS[minutes]
+        else:
+            view[field] = format_minutes(parse_time_or_none(document.get(field)))
+    return view
+
+def user_read(fields: Optional[str]) -> tuple:
+    # Returns (projection, document -> payload) for user reads
+    selected = parse_fields(User, fields)
+    if selected is None:
+        return USER_PROJECTION, user_payload
+    return sparse_projection(selected), lambda document: sparse_payload(document, selected, USER_DEFAULTS)
+
+def schedule_read(fields: Optional[str], day: Optional[DayOfWeek]) -> tuple:
+    # Returns (projection, document -> payload) for schedule reads
+    selected = schedule_fields(fields, day)
+    if selected is None:
+        return SCHEDULE_PROJECTION, schedule_payload
+    projection, day_offset = schedule_sparse_projection(selected)
+    return projection, lambda document: sparse_schedule_view(document, selected, day_offset)
+
+# NDJSON streaming: opt-in with ?stream=1 or Accept: application/x-ndjson.
+# Documents are written as the Mongo cursor yields them instead of being
+# collected into a list first, and the page limit does not apply.
+NDJSON_MEDIA_TYPE = "application/x-ndjson"
+STREAM_BATCH_SIZE = 500
+
+def wants_stream(request: Request, stream: bool) -> bool:
+    return stream or NDJSON_MEDIA_TYPE in request.headers.get("accept", "")
+
+def stream_ndjson(collection, query: dict, after: Optional[str], build, projection: Optional[dict] = None) -> StreamingResponse:
+    # build turns a projected document into the dict written on each line
+    if after:
+        query = {"$and": [query, decode_cursor(after)]}
+    
+    async def generate():
+        cursor = collection.find(query, projection).sort(PAGINATION_SORT).batch_size(STREAM_BATCH_SIZE)
+        lines = []
+        async for document in cursor:
+            lines.append(orjson.dumps(build(document)) + b"\n")
+            if len(lines) >= STREAM_BATCH_SIZE:
+                yield b"".join(lines)
+                lines = []
+        if lines:
+            yield b"".join(lines)
+    
+    return StreamingResponse(generate(), media_type=NDJSON_MEDIA_TYPE)
+
+# Schedule request events: an in-process pub/sub bus feeding the SSE stream.
+# With a replica set, a change stream on schedule_requests publishes instead so
+# that writes made by any worker reach every subscriber.
+EVENT_QUEUE_SIZE = 1000
+SSE_HEARTBEAT_SECONDS = 15
+# EventSource cannot send headers, so browsers authenticate with a short-lived
+# token scoped to the stream instead of putting the access token in the URL.
+# The token is only checked when the stream opens and the server never closes
+# it on its own; after a network error the automatic reconnect reuses an
+# expired token, so clients must close the EventSource on "error" and open a
+# new one with a fresh token.
+STREAM_TOKEN_SCOPE = "schedule-request-events"
+STREAM_TOKEN_EXPIRE_SECONDS = 60
+
+class EventBus:
+    def __init__(self, queue_size: int):
+        self.queue_size = queue_size
+        self.subscribers: set = set()
+        self.change_stream_task: Optional[asyncio.Task] = None
+
+    def subscribe(self) -> asyncio.Queue:
+        queue = asyncio.Queue(self.queue_size)
+        self.subscribers.add(queue)
+        return queue
+
+    def unsubscribe(self, queue: asyncio.Queue):
+        self.subscribers.discard(queue)
+
+    def publish(self, event: dict):
+        for queue in list(self.subscribers):
+            try:
+                queue.put_nowait(event)
+            except asyncio.QueueFull:
+                # A subscriber that fell behind is dropped and told to resync
+                self.subscribers.discard(queue)
+                queue.get_nowait()
+                queue.put_nowait(None)
+
+request_events = EventBus(EVENT_QUEUE_SIZE)
+
+def publish_request_event(event_type: str, request: dict):
+    if request_events.change_stream_task is None:
+        request_events.publish({"type": event_type, "request": request})
+
+async def watch_schedule_requests():
+    pipeline = [{"$match": {"operationType": {"$in": ["insert", "update", "replace"]}}}]
+    while True:
+        try:
+            async with db.schedule_requests.watch(pipeline, full_document="updateLookup") as stream:
+                async for change in stream:
+                    if change.get("fullDocument"):
+                        event_type = "created" if change["operationType"] == "insert" else "updated"
+                        request_events.publish({"type": event_type, "request": change["fullDocument"]})
+        except PyMongoError:
+            logger.exception("Schedule request change stream failed, restarting")
+            await asyncio.sleep(1)
+
+async def replica_set_available() -> bool:
+    try:
+        hello = await client.admin.command("hello")
+    except Exception:
+        return False
+    return "setName" in hello
+
+# Detected at startup; change streams and transactions need a replica set
+database_features = {"replica_set": False}
+
 # Authentication Routes
 @api_router.post("/register", response_model=User)
 async def register(user_data: UserCreate):
-    # Check if user already exists
-    existing_user = await db.users.find_one({"username": user_data.username})
-    if existing_user:
-        raise HTTPException(status_code=400, detail="Username already registered")
-    
     # Hash password
-    hashed_password = hash_password(user_data.password)
+    hashed_password = await run_cpu_bound(hash_password, user_data.password)
     
     # Create user
     user_dict = user_data.dict()
@@ -223,13 +763,17 @@ async def register(user_data: UserCreate):
     user_dict["password_hash"] = hashed_password
     user_obj = User(**user_dict)
     
-    await db.users.insert_one(user_obj.dict())
+    try:
+        await db.users.insert_one(user_obj.dict())
+    except DuplicateKeyError:
+        raise HTTPException(status_code=400, detail="Username already registered")
+    await track_user_service(user_dict)
     return user_obj
 
 @api_router.post("/login", response_model=Token)
 async def login(user_data: UserLogin):
     user = await db.users.find_one({"username": user_data.username})
-    if not user or not verify_password(user_data.password, user["password_hash"]):
+    if not user or not await run_cpu_bound(verify_password, user_data.password, user["password_hash"]):
         raise HTTPException(status_code=401, detail="Incorrect username or password")
     
     access_token_expires = timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
@@ -246,66 +790,153 @@ async def read_users_me(current_user: User = Depends(get_current_active_user)):
 
 # User Management Routes
 @api_router.get("/users", response_model=List[User])
-async def get_users(current_user: User = Depends(get_current_active_user)):
+async def get_users(
+    request: Request,
+    response: Response,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    after: Optional[str] = None,
+    service: Optional[str] = None,
+    role: Optional[UserRole] = None,
+    is_active: Optional[bool] = None,
+    fields: Optional[str] = None,
+    stream: bool = False,
+    current_user: User = Depends(get_current_active_user)
+):
     if current_user.role not in [UserRole.ADMIN, UserRole.COORDINATOR]:
         raise HTTPException(status_code=403, detail="Not enough permissions")
     
-    users = await db.users.find().to_list(1000)
-    return [User(**user) for user in users]
+    projection, build = user_read(fields)
+    query = {}
+    if service is not None:
+        query["service"] = service
+    if role is not None:
+        query["role"] = role.value
+    if is_active is not None:
+        query["is_active"] = is_active
+    
+    if wants_stream(request, stream):
+        return stream_ndjson(db.users, query, after, build, projection)
+    
+    users = await fetch_page(db.users, query, limit, after, response, projection)
+    return trusted_response([build(user) for user in users], response)
 
 @api_router.get("/employees", response_model=List[User])
-async def get_employees(current_user: User = Depends(get_current_active_user)):
+async def get_employees(
+    response: Response,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    after: Optional[str] = None,
+    service: Optional[str] = None,
+    is_active: Optional[bool] = None,
+    fields: Optional[str] = None,
+    current_user: User = Depends(get_current_active_user)
+):
     if current_user.role not in [UserRole.ADMIN, UserRole.COORDINATOR]:
         raise HTTPException(status_code=403, detail="Not enough permissions")
     
-    employees = await db.users.find({"role": UserRole.EMPLOYEE}).to_list(1000)
-    return [User(**employee) for employee in employees]
+    projection, build = user_read(fields)
+    query = {"role": UserRole.EMPLOYEE.value}
+    if service is not None:
+        query["service"] = service
+    if is_active is not None:
+        query["is_active"] = is_active
+    
+    employees = await fetch_page(db.users, query, limit, after, response, projection)
+    return trusted_response([build(employee) for employee in employees], response)
 
 @api_router.get("/users/{user_id}", response_model=User)
-async def get_user(user_id: str, current_user: User = Depends(get_current_active_user)):
+async def get_user(user_id: str, fields: Optional[str] = None, current_user: User = Depends(get_current_active_user)):
     if current_user.role not in [UserRole.ADMIN, UserRole.COORDINATOR]:
         raise HTTPException(status_code=403, detail="Not enough permissions")
     
-    user = await db.users.find_one({"id": user_id})
+    projection, build = user_read(fields)
+    user = await db.users.find_one({"id": user_id}, projection)
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
     
-    return User(**user)
+    return ORJSONResponse(build(user))
 
 @api_router.put("/users/{user_id}", response_model=User)
 async def update_user(user_id: str, user_data: UserUpdate, current_user: User = Depends(get_current_active_user)):
     if current_user.role not in [UserRole.ADMIN, UserRole.COORDINATOR]:
         raise HTTPException(status_code=403, detail="Not enough permissions")
     
-    # Check if user exists
-    existing_user = await db.users.find_one({"id": user_id})
-    if not existing_user:
-        raise HTTPException(status_code=404, detail="User not found")
-    
     # Prepare update data
     update_data = {}
     for field, value in user_data.dict(exclude_unset=True).items():
         if field == "password" and value:
-            update_data["password_hash"] = hash_password(value)
+            update_data["password_hash"] = await run_cpu_bound(hash_password, value)
         elif value is not None:
             update_data[field] = value
     
-    # Check if username already exists (if updating username)
-    if "username" in update_data:
-        existing_username = await db.users.find_one({"username": update_data["username"], "id": {"$ne": user_id}})
-        if existing_username:
-            raise HTTPException(status_code=400, detail="Username already exists")
+    if not update_data:
+        existing_user = await db.users.find_one({"id": user_id})
+        if not existing_user:
+            raise HTTPException(status_code=404, detail="User not found")
+        return User(**existing_user)
     
-    # Update user
-    await db.users.update_one(
-        {"id": user_id},
-        {"$set": update_data}
-    )
+    # One atomic write; the previous document is needed to invalidate the old
+    # username and move service counts. Username uniqueness is the unique index.
+    try:
+        existing_user = await db.users.find_one_and_update(
+            {"id": user_id},
+            {"$set": update_data},
+            return_document=ReturnDocument.BEFORE
+        )
+    except DuplicateKeyError:
+        raise HTTPException(status_code=400, detail="Username already exists")
+    if not existing_user:
+        raise HTTPException(status_code=404, detail="User not found")
     
-    # Get updated user
-    updated_user = await db.users.find_one({"id": user_id})
+    updated_user = {**existing_user, **update_data}
+    await invalidate_principal(existing_user.get("username"), updated_user.get("username"))
+    if updated_user.get("service") != existing_user.get("service"):
+        await track_user_service(existing_user, -1)
+        await track_user_service(updated_user)
+    if any(updated_user.get(field) != existing_user.get(field) for field in SCHEDULE_USER_FIELDS):
+        await schedules_changed()
     return User(**updated_user)
 
+# User fields that schedule exports, reports and coverage depend on
+SCHEDULE_USER_FIELDS = ["full_name", "service", "is_active"]
+
+# Collections holding documents owned by a user, deleted before the user itself
+USER_DEPENDENTS = [("schedules", "user_id"), ("schedule_requests", "employee_id")]
+
+async def cascade_delete_users(users: List[dict]) -> Dict[str, int]:
+    user_ids = [user["id"] for user in users]
+    if not user_ids:
+        return {"users": 0, **{name: 0 for name, _ in USER_DEPENDENTS}}
+    
+    if database_features["replica_set"]:
+        # All or nothing. Operations on one session must not overlap, so they
+        # run in turn inside the transaction.
+        async def delete_all(session):
+            deleted = {}
+            for name, field in USER_DEPENDENTS + [("users", "id")]:
+                result = await db[name].delete_many({field: {"$in": user_ids}}, session=session)
+                deleted[name] = result.deleted_count
+            return deleted
+        
+        async with await client.start_session() as session:
+            deleted = await session.with_transaction(delete_all)
+    else:
+        # Best effort: dependents are deleted concurrently and the users last,
+        # so a failure leaves users that can be deleted again, never orphans
+        results = await asyncio.gather(*(
+            db[name].delete_many({field: {"$in": user_ids}}) for name, field in USER_DEPENDENTS
+        ))
+        deleted = {name: result.deleted_count for (name, _), result in zip(USER_DEPENDENTS, results)}
+        deleted["users"] = (await db.users.delete_many({"id": {"$in": user_ids}})).deleted_count
+    
+    await invalidate_principal(*(user.get("username") for user in users))
+    counts = Counter()
+    for user in users:
+        counts[user.get("service")] -= 1
+    employees = Counter(user.get("service") for user in users if user.get("role") == UserRole.EMPLOYEE)
+    await adjust_service_counts({service: (count, -employees[service]) for service, count in counts.items()})
+    await schedules_changed(removed_user_ids=user_ids)
+    return deleted
+
 @api_router.delete("/users/{user_id}")
 async def delete_user(user_id: str, current_user: User = Depends(get_current_active_user)):
     if current_user.role not in [UserRole.ADMIN, UserRole.COORDINATOR]:
@@ -321,61 +952,193 @@ async def delete_user(user_id: str, current_user: User = Depends(get_current_act
         raise HTTPException(status_code=400, detail="Cannot delete admin users")
     
     # Delete user and their schedule
-    await db.users.delete_one({"id": user_id})
-    await db.schedules.delete_many({"user_id": user_id})
-    await db.schedule_requests.delete_many({"employee_id": user_id})
+    await cascade_delete_users([existing_user])
     
     return {"message": "User deleted successfully"}
 
 # Schedule Management Routes
+def unreadable_time_fields(document: dict) -> List[str]:
+    return [
+        field for field in SCHEDULE_TIME_FIELDS
+        if parse_time_or_none(document.get(field)) is None and str(document.get(field)).strip() not in EMPTY_CELL_VALUES
+    ]
+
+async def migrate_schedule_documents(batch_size: int = 1000) -> tuple:
+    # Convert legacy documents (28 string fields) to the shifts array in place.
+    # Documents with unreadable times are left untouched so no value is lost;
+    # returns (migrated count, ids of the skipped documents).
+    projection = {"_id": 1, "id": 1, **{field: 1 for field in SCHEDULE_TIME_FIELDS}}
+    cursor = db.schedules.find({"shifts": {"$exists": False}}, projection).batch_size(batch_size)
+    operations = []
+    migrated = 0
+    skipped = []
+    async for document in cursor:
+        fields = unreadable_time_fields(document)
+        if fields:
+            skipped.append(document.get("id", str(document["_id"])))
+            logger.warning("Schedule %s not migrated, unreadable times in %s", skipped[-1], ", ".join(fields))
+            continue
+        operations.append(UpdateOne(
+            {"_id": document["_id"]},
+            {"$set": {"shifts": legacy_shifts(document)}, "$unset": LEGACY_TIME_FIELDS_UNSET}
+        ))
+        if len(operations) >= batch_size:
+            await db.schedules.bulk_write(operations, ordered=False)
+            migrated += len(operations)
+            operations = []
+    if operations:
+        await db.schedules.bulk_write(operations, ordered=False)
+        migrated += len(operations)
+    if migrated:
+        await bump_dataset_version(SCHEDULES_DATASET)
+    return migrated, skipped
+
 @api_router.post("/schedules", response_model=Schedule)
 async def create_schedule(schedule_data: Schedule, current_user: User = Depends(get_current_active_user)):
     if current_user.role not in [UserRole.ADMIN, UserRole.COORDINATOR]:
         raise HTTPException(status_code=403, detail="Not enough permissions")
     
-    await db.schedules.insert_one(schedule_data.dict())
+    try:
+        await db.schedules.insert_one(schedule_document(schedule_data))
+    except DuplicateKeyError:
+        raise HTTPException(status_code=400, detail="Schedule already exists for this user")
+    await schedules_changed(upserted=[schedule_document(schedule_data)])
     return schedule_data
 
 @api_router.get("/schedules", response_model=List[Schedule])
-async def get_schedules(current_user: User = Depends(get_current_active_user)):
+async def get_schedules(
+    request: Request,
+    response: Response,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    after: Optional[str] = None,
+    service: Optional[str] = None,
+    fields: Optional[str] = None,
+    day: Optional[DayOfWeek] = None,
+    stream: bool = False,
+    current_user: User = Depends(get_current_active_user)
+):
+    projection, build = schedule_read(fields, day)
     if current_user.role == UserRole.EMPLOYEE:
         # Employees can only see their own schedules
-        schedules = await db.schedules.find({"user_id": current_user.id}).to_list(1000)
+        query = {"user_id": current_user.id}
     else:
         # Coordinators and admins can see all schedules
-        schedules = await db.schedules.find().to_list(1000)
+        query = {}
+    if service is not None:
+        query["service"] = service
+    
+    if wants_stream(request, stream):
+        return stream_ndjson(db.schedules, query, after, build, projection)
     
-    return [Schedule(**schedule) for schedule in schedules]
+    schedules = await fetch_page(db.schedules, query, limit, after, response, projection)
+    return trusted_response([build(schedule) for schedule in schedules], response)
 
 @api_router.get("/schedules/{user_id}", response_model=Schedule)
-async def get_user_schedule(user_id: str, current_user: User = Depends(get_current_active_user)):
+async def get_user_schedule(
+    user_id: str,
+    fields: Optional[str] = None,
+    day: Optional[DayOfWeek] = None,
+    current_user: User = Depends(get_current_active_user)
+):
     if current_user.role == UserRole.EMPLOYEE and current_user.id != user_id:
         raise HTTPException(status_code=403, detail="Not enough permissions")
     
-    schedule = await db.schedules.find_one({"user_id": user_id})
+    projection, build = schedule_read(fields, day)
+    schedule = await db.schedules.find_one({"user_id": user_id}, projection)
     if not schedule:
         raise HTTPException(status_code=404, detail="Schedule not found")
     
-    return Schedule(**schedule)
+    return ORJSONResponse(build(schedule))
 
 @api_router.get("/my-schedule", response_model=Schedule)
-async def get_my_schedule(current_user: User = Depends(get_current_active_user)):
-    schedule = await db.schedules.find_one({"user_id": current_user.id})
+async def get_my_schedule(
+    fields: Optional[str] = None,
+    day: Optional[DayOfWeek] = None,
+    current_user: User = Depends(get_current_active_user)
+):
+    projection, build = schedule_read(fields, day)
+    schedule = await db.schedules.find_one({"user_id": current_user.id}, projection)
     if not schedule:
         raise HTTPException(status_code=404, detail="Schedule not found")
     
-    return Schedule(**schedule)
+    return ORJSONResponse(build(schedule))
 
 @api_router.put("/schedules/{schedule_id}", response_model=Schedule)
 async def update_schedule(schedule_id: str, schedule_data: Schedule, current_user: User = Depends(get_current_active_user)):
     if current_user.role not in [UserRole.ADMIN, UserRole.COORDINATOR]:
         raise HTTPException(status_code=403, detail="Not enough permissions")
     
-    await db.schedules.update_one(
-        {"id": schedule_id},
-        {"$set": schedule_data.dict()}
-    )
-    return schedule_data
+    # The stored id and creation time are kept; user_id stays unique by index
+    update_data = schedule_document(schedule_data)
+    update_data.pop("id")
+    update_data.pop("created_at")
+    try:
+        updated_schedule = await db.schedules.find_one_and_update(
+            {"id": schedule_id},
+            {"$set": update_data, "$unset": LEGACY_TIME_FIELDS_UNSET},
+            return_document=ReturnDocument.AFTER
+        )
+    except DuplicateKeyError:
+        raise HTTPException(status_code=400, detail="Schedule already exists for this user")
+    if not updated_schedule:
+        raise HTTPException(status_code=404, detail="Schedule not found")
+    
+    await schedules_changed(removed_ids=[schedule_id], upserted=[updated_schedule])
+    return schedule_from_document(updated_schedule)
+
+MAX_BATCH_SIZE = 1000
+
+def check_batch_ids(ids: List[str]):
+    if len(ids) > MAX_BATCH_SIZE:
+        raise HTTPException(status_code=400, detail=f"Batches are limited to {MAX_BATCH_SIZE} items")
+    duplicates = sorted(item_id for item_id, count in Counter(ids).items() if count > 1)
+    if duplicates:
+        raise HTTPException(status_code=400, detail=f"Duplicate ids in batch: {', '.join(duplicates)}")
+
+@api_router.patch("/schedules/batch", response_model=BatchResult)
+async def update_schedules_batch(updates: List[ScheduleBatchUpdate], current_user: User = Depends(get_current_active_user)):
+    if current_user.role not in [UserRole.ADMIN, UserRole.COORDINATOR]:
+        raise HTTPException(status_code=403, detail="Not enough permissions")
+    check_batch_ids([update.id for update in updates])
+    
+    # Times are set in place in the shifts array; documents still in the
+    # legacy layout are not matched
+    operations = []
+    results = {}
+    for update in updates:
+        changes = update.dict(exclude={"id"}, exclude_unset=True)
+        if not changes:
+            results[update.id] = BatchItemResult(id=update.id, status_code=400, detail="No changes")
+            continue
+        update_data = {"service": changes.pop("service")} if "service" in changes else {}
+        for day_index, day in enumerate(DAYS):
+            for point_index, point in enumerate(SHIFT_POINTS):
+                field = f"{day}_{point}"
+                if field in changes:
+                    update_data[f"shifts.{day_index}.{point_index}"] = parse_time_minutes(changes[field])
+        operations.append(UpdateOne({"id": update.id, "shifts": {"$type": "array"}}, {"$set": update_data}))
+    if operations:
+        await db.schedules.bulk_write(operations, ordered=False)
+    
+    pending_ids = [update.id for update in updates if update.id not in results]
+    schedules = {
+        schedule["id"]: schedule
+        async for schedule in db.schedules.find({"id": {"$in": pending_ids}}, {"_id": 0})
+    } if pending_ids else {}
+    updated = []
+    for schedule_id in pending_ids:
+        schedule = schedules.get(schedule_id)
+        if schedule is None:
+            results[schedule_id] = BatchItemResult(id=schedule_id, status_code=404, detail="Schedule not found")
+        elif not isinstance(schedule.get("shifts"), list):
+            results[schedule_id] = BatchItemResult(id=schedule_id, status_code=409, detail="Schedule uses the legacy layout, run migrate-schedules")
+        else:
+            results[schedule_id] = BatchItemResult(id=schedule_id, status_code=200)
+            updated.append(schedule)
+    
+    if updated:
+        await schedules_changed(removed_ids=[schedule["id"] for schedule in updated], upserted=updated)
+    return BatchResult(updated=len(updated), results=[results[update.id] for update in updates])
 
 # Schedule Request Routes
 @api_router.post("/schedule-requests", response_model=ScheduleRequest)
@@ -388,26 +1151,62 @@ async def create_schedule_request(request_data: ScheduleRequestCreate, current_u
     request_obj = ScheduleRequest(**request_dict)
     
     await db.schedule_requests.insert_one(request_obj.dict())
+    publish_request_event("created", request_obj.dict())
     return request_obj
 
+def requested_date_filter(date_from: Optional[date], date_to: Optional[date]) -> dict:
+    # requested_date is stored as an ISO date string, so ranges compare lexically
+    date_range = {}
+    if date_from is not None:
+        date_range["$gte"] = date_from.isoformat()
+    if date_to is not None:
+        date_range["$lte"] = date_to.isoformat()
+    return {"requested_date": date_range} if date_range else {}
+
 @api_router.get("/schedule-requests", response_model=List[ScheduleRequest])
-async def get_schedule_requests(current_user: User = Depends(get_current_active_user)):
+async def get_schedule_requests(
+    response: Response,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    after: Optional[str] = None,
+    status: Optional[RequestStatus] = None,
+    employee_id: Optional[str] = None,
+    date_from: Optional[date] = None,
+    date_to: Optional[date] = None,
+    current_user: User = Depends(get_current_active_user)
+):
     if current_user.role == UserRole.EMPLOYEE:
         # Employees can only see their own requests
-        requests = await db.schedule_requests.find({"employee_id": current_user.id}).to_list(1000)
+        query = {"employee_id": current_user.id}
     else:
         # Coordinators and admins can see all requests
-        requests = await db.schedule_requests.find().to_list(1000)
+        query = {"employee_id": employee_id} if employee_id is not None else {}
+    if status is not None:
+        query["status"] = status.value
+    query.update(requested_date_filter(date_from, date_to))
     
-    return [ScheduleRequest(**request) for request in requests]
+    requests = await fetch_page(db.schedule_requests, query, limit, after, response, SCHEDULE_REQUEST_PROJECTION)
+    return trusted_response(document_payload(requests, SCHEDULE_REQUEST_DEFAULTS), response)
 
 @api_router.get("/pending-requests", response_model=List[ScheduleRequest])
-async def get_pending_requests(current_user: User = Depends(get_current_active_user)):
+async def get_pending_requests(
+    response: Response,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    after: Optional[str] = None,
+    employee_id: Optional[str] = None,
+    date_from: Optional[date] = None,
+    date_to: Optional[date] = None,
+    current_user: User = Depends(get_current_active_user)
+):
     if current_user.role not in [UserRole.ADMIN, UserRole.COORDINATOR]:
         raise HTTPException(status_code=403, detail="Not enough permissions")
     
-    requests = await db.schedule_requests.find({"status": RequestStatus.PENDING}).to_list(1000)
-    return [ScheduleRequest(**request) for request in requests]
+    query = {"status": RequestStatus.PENDING.value}
+    if employee_id is not None:
+        query["employee_id"] = employee_id
+    query.update(requested_date_filter(date_from, date_to))
+    
+    requests = await fetch_page(db.schedule_requests, query, limit, after, response, SCHEDULE_REQUEST_PROJECTION)
+    return trusted_response(document_payload(requests, SCHEDULE_REQUEST_DEFAULTS), response)
 
 @api_router.put("/schedule-requests/{request_id}/respond", response_model=ScheduleRequest)
 async def respond_to_request(request_id: str, response_data: ScheduleRequestResponse, current_user: User = Depends(get_current_active_user)):
@@ -421,76 +1220,408 @@ async def respond_to_request(request_id: str, response_data: ScheduleRequestResp
         "processed_at": datetime.utcnow()
     }
     
-    await db.schedule_requests.update_one(
-        {"id": request_id},
-        {"$set": update_data}
+    # Only pending requests can be answered, so concurrent responses cannot
+    # overwrite each other
+    updated_request = await db.schedule_requests.find_one_and_update(
+        {"id": request_id, "status": RequestStatus.PENDING.value},
+        {"$set": update_data},
+        return_document=ReturnDocument.AFTER
     )
+    if not updated_request:
+        if await db.schedule_requests.count_documents({"id": request_id}, limit=1):
+            raise HTTPException(status_code=409, detail="Request has already been processed")
+        raise HTTPException(status_code=404, detail="Request not found")
     
-    updated_request = await db.schedule_requests.find_one({"id": request_id})
+    publish_request_event("updated", updated_request)
     return ScheduleRequest(**updated_request)
 
-# Excel Import/Export Routes
-@api_router.get("/download-template")
-async def download_template(current_user: User = Depends(get_current_active_user)):
+@api_router.post("/schedule-requests/respond-batch", response_model=BatchResult)
+async def respond_to_requests_batch(responses: List[ScheduleRequestResponse], current_user: User = Depends(get_current_active_user)):
     if current_user.role not in [UserRole.ADMIN, UserRole.COORDINATOR]:
         raise HTTPException(status_code=403, detail="Not enough permissions")
+    request_ids = [response_data.request_id for response_data in responses]
+    check_batch_ids(request_ids)
+    if not responses:
+        return BatchResult(updated=0, results=[])
+    
+    # Mongo stores milliseconds; the shared timestamp identifies this batch's writes
+    processed_at = datetime.utcnow()
+    processed_at = processed_at.replace(microsecond=processed_at.microsecond // 1000 * 1000)
+    await db.schedule_requests.bulk_write([
+        UpdateOne(
+            {"id": response_data.request_id, "status": RequestStatus.PENDING.value},
+            {"$set": {
+                "status": response_data.status,
+                "coordinator_response": response_data.response,
+                "processed_by": current_user.id,
+                "processed_at": processed_at
+            }}
+        )
+        for response_data in responses
+    ], ordered=False)
     
-    # Create Excel template
+    requests = {
+        request["id"]: request
+        async for request in db.schedule_requests.find({"id": {"$in": request_ids}})
+    }
+    results = []
+    updated = 0
+    for request_id in request_ids:
+        request = requests.get(request_id)
+        if request is None:
+            results.append(BatchItemResult(id=request_id, status_code=404, detail="Request not found"))
+        elif request.get("processed_by") != current_user.id or request.get("processed_at") != processed_at:
+            results.append(BatchItemResult(id=request_id, status_code=409, detail="Request has already been processed"))
+        else:
+            results.append(BatchItemResult(id=request_id, status_code=200))
+            publish_request_event("updated", request)
+            updated += 1
+    return BatchResult(updated=updated, results=results)
+
+stream_security = HTTPBearer(auto_error=False)
+
+async def get_stream_user(
+    token: Optional[str] = None,
+    credentials: Optional[HTTPAuthorizationCredentials] = Depends(stream_security)
+):
+    if credentials is not None:
+        return await get_current_active_user(await user_from_token(credentials.credentials))
+    if token is None:
+        raise HTTPException(status_code=401, detail="Not authenticated", headers={"WWW-Authenticate": "Bearer"})
+    return await get_current_active_user(await user_from_token(token, scope=STREAM_TOKEN_SCOPE))
+
+@api_router.post("/schedule-requests/events/token", response_model=StreamToken)
+async def create_stream_token(current_user: User = Depends(get_current_active_user)):
+    token = create_access_token(
+        data={"sub": current_user.username, "scope": STREAM_TOKEN_SCOPE},
+        expires_delta=timedelta(seconds=STREAM_TOKEN_EXPIRE_SECONDS)
+    )
+    return StreamToken(token=token, expires_in=STREAM_TOKEN_EXPIRE_SECONDS)
+
+@api_router.get("/schedule-requests/events")
+async def stream_schedule_request_events(request: Request, current_user: User = Depends(get_stream_user)):
+    employee_id = current_user.id if current_user.role == UserRole.EMPLOYEE else None
+    queue = request_events.subscribe()
+    
+    async def generate():
+        nonlocal queue
+        try:
+            while not await request.is_disconnected():
+                try:
+                    event = await asyncio.wait_for(queue.get(), SSE_HEARTBEAT_SECONDS)
+                except asyncio.TimeoutError:
+                    yield ": keep-alive\n\n"
+                    continue
+                if event is None:
+                    # The subscriber fell behind and was dropped: subscribe
+                    # again and tell the client to refetch instead of closing
+                    queue = request_events.subscribe()
+                    yield "event: resync\ndata: {}\n\n"
+                    continue
+                if employee_id is not None and event["request"].get("employee_id") != employee_id:
+                    continue
+                payload = ScheduleRequest(**event["request"]).json()
+                yield f"event: {event['type']}\ndata: {payload}\n\n"
+        finally:
+            request_events.unsubscribe(queue)
+    
+    return StreamingResponse(
+        generate(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+# Excel Import/Export Routes
+DAY_COLUMN_LABELS = {
+    "monday": "Lunes",
+    "tuesday": "Martes",
+    "wednesday": "miercoles",
+    "thursday": "Jueves",
+    "friday": "Viernes",
+    "saturday": "Sábado",
+    "sunday": "Domingo",
+}
+SHIFT_COLUMN_LABELS = {
+    "start": "INICIO JORNADA",
+    "break_start": "INICIO DESCANSO",
+    "break_end": "FIN DESCANSO",
+    "end": "FIN JORNADA",
+}
+# Spreadsheet column -> Schedule field, in template order
+SCHEDULE_TIME_COLUMNS = {
+    f"{day_label} {shift_label}": f"{day}_{shift}"
+    for day, day_label in DAY_COLUMN_LABELS.items()
+    for shift, shift_label in SHIFT_COLUMN_LABELS.items()
+}
+XLSX_MEDIA_TYPE = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+IMPORT_BATCH_SIZE = 1000
+DEFAULT_IMPORTED_PASSWORD = "123456"
+
+def time_frame_to_minutes(raw_times: pd.DataFrame) -> np.ndarray:
+    # Parse every time cell into minutes since midnight (NaN when empty),
+    # one vectorized pass per column
+    text = raw_times.astype(str).apply(lambda column: column.str.strip())
+    empty = (raw_times.isna() | text.isin(EMPTY_CELL_VALUES)).to_numpy()
+    minutes = np.full(raw_times.shape, np.nan)
+    for index, column in enumerate(raw_times.columns):
+        parts = text[column].str.extract(TIME_PATTERN).astype(float)
+        parsed = (parts[0] * 60 + parts[1]).where(parts[1] < 60)
+        # Cells formatted as numbers hold Excel day fractions
+        numeric = pd.to_numeric(raw_times[column], errors="coerce")
+        fraction = (numeric * MINUTES_PER_DAY).round().where((numeric >= 0) & (numeric <= 1))
+        minutes[:, index] = parsed.fillna(fraction).to_numpy()
+    minutes[minutes > MINUTES_PER_DAY] = np.nan
+    
+    invalid = ~empty & np.isnan(minutes)
+    if invalid.any():
+        row, column = np.argwhere(invalid)[0]
+        raise ValueError(
+            f"Invalid time '{text.iat[row, column]}' in column '{raw_times.columns[column]}', row {raw_times.index[row]}"
+        )
+    minutes[empty] = np.nan
+    return minutes
+
+def normalize_import_frame(df: pd.DataFrame) -> pd.DataFrame:
+    # Keep rows with a name and turn the 28 time columns into a shifts array per row
+    names = df["Nombre"] if "Nombre" in df.columns else pd.Series(index=df.index, dtype=object)
+    names = names.where(names.notna(), "").astype(str).str.strip()
+    rows = df.loc[names != ""]
+    
+    minutes = time_frame_to_minutes(rows.reindex(columns=list(SCHEDULE_TIME_COLUMNS)))
+    shifts = [
+        [[None if np.isnan(value) else int(value) for value in day] for day in row]
+        for row in minutes.reshape(len(rows), len(DAYS), len(SHIFT_POINTS))
+    ]
+    
+    services = rows["Servicio"] if "Servicio" in rows.columns else pd.Series(index=rows.index, dtype=object)
+    services = services.fillna("").astype(str).str.strip()
+    missing_service = services.isin(EMPTY_CELL_VALUES)
+    if missing_service.any():
+        row = missing_service.idxmax()
+        raise ValueError(f"Missing 'Servicio' for employee '{names.loc[row]}', row {row}")
+    return pd.DataFrame({
+        "full_name": names.loc[rows.index],
+        "service": services,
+        "shifts": pd.Series(shifts, index=rows.index, dtype=object),
+    })
+
+def username_from_name(full_name: str) -> str:
+    return full_name.lower().replace(" ", "_").replace(".", "")
+
+async def run_bulk_write(collection, operations: list):
+    for start in range(0, len(operations), IMPORT_BATCH_SIZE):
+        await collection.bulk_write(operations[start:start + IMPORT_BATCH_SIZE], ordered=False)
+
+async def import_schedule_frame(df: pd.DataFrame):
+    rows = await run_blocking(normalize_import_frame, df)
+    if rows.empty:
+        return 0, 0
+    
+    # Resolve every employee name with a single query
+    names = rows["full_name"].unique().tolist()
+    user_ids = {}
+    async for user in db.users.find({"full_name": {"$in": names}}, {"_id": 0, "id": 1, "full_name": 1}):
+        user_ids.setdefault(user["full_name"], user["id"])
+    
+    # Create the missing users, avoiding username clashes with the DB and the file
+    first_rows = rows.drop_duplicates("full_name")
+    missing = first_rows.loc[~first_rows["full_name"].isin(list(user_ids))]
+    new_users = []
+    if not missing.empty:
+        candidates = [username_from_name(name) for name in missing["full_name"]]
+        taken = set(await db.users.distinct("username", {"username": {"$in": candidates}}))
+        password_hash = await run_cpu_bound(hash_password, DEFAULT_IMPORTED_PASSWORD)
+        now = datetime.utcnow()
+        for full_name, service, username in zip(missing["full_name"], missing["service"], candidates):
+            if username in taken:
+                username = f"{username}_{str(uuid.uuid4())[:8]}"
+            taken.add(username)
+            user_ids[full_name] = str(uuid.uuid4())
+            new_users.append(InsertOne({
+                "id": user_ids[full_name],
+                "username": username,
+                "email": f"{username}@empresa.com",
+                "full_name": full_name,
+                "password_hash": password_hash,
+                "role": UserRole.EMPLOYEE.value,
+                "service": service,
+                "is_active": True,
+                "created_at": now
+            }))
+        await run_bulk_write(db.users, new_users)
+        await adjust_service_counts({
+            service: (int(count), int(count)) for service, count in missing["service"].value_counts().items()
+        })
+    
+    # Upsert one schedule per user; the last row for a name wins
+    rows = rows.assign(user_id=rows["full_name"].map(user_ids))
+    now = datetime.utcnow()
+    schedule_updates = [
+        UpdateOne(
+            {"user_id": schedule["user_id"]},
+            {
+                "$set": schedule,
+                "$unset": LEGACY_TIME_FIELDS_UNSET,
+                "$setOnInsert": {"id": str(uuid.uuid4()), "created_at": now}
+            },
+            upsert=True
+        )
+        for schedule in rows.drop(columns="full_name").drop_duplicates("user_id", keep="last").to_dict("records")
+    ]
+    await run_bulk_write(db.schedules, schedule_updates)
+    await bump_dataset_version(SCHEDULES_DATASET)
+    
+    return len(rows), len(new_users)
+
+# Template layout: the headers match the import/export columns
+TEMPLATE_HEADERS = ["Nombre", "Servicio", "Desde", "Hasta", *SCHEDULE_TIME_COLUMNS]
+TEMPLATE_SAMPLE_ROW = [
+    "Juan Pérez", "Administración", "2024-01-01", "2024-12-31",
+    "08:00", "12:00", "13:00", "17:00",  # Lunes
+    "08:00", "12:00", "13:00", "17:00",  # Martes
+    "08:00", "12:00", "13:00", "17:00",  # Miércoles
+    "08:00", "12:00", "13:00", "17:00",  # Jueves
+    "08:00", "12:00", "13:00", "17:00",  # Viernes
+    "", "", "", "",  # Sábado (vacío)
+    "", "", "", ""   # Domingo (vacío)
+]
+
+def build_template_bytes(headers: list, sample_row: list) -> bytes:
     wb = Workbook()
     ws = wb.active
     ws.title = "Plantilla Horarios"
     
-    # Headers - exact format requested
-    headers = [
-        "Nombre", "Servicio", "Desde", "Hasta",
-        "Lunes INICIO JORNADA", "Lunes INICIO DESCANSO", "Lunes FIN DESCANSO", "Lunes FIN JORNADA",
-        "Martes INICIO JORNADA", "Martes INICIO DESCANSO", "Martes FIN DESCANSO", "Martes FIN JORNADA",
-        "miercoles INICIO JORNADA", "miercoles INICIO DESCANSO", "miercoles FIN DESCANSO", "miercoles FIN JORNADA",
-        "Jueves INICIO JORNADA", "Jueves INICIO DESCANSO", "Jueves FIN DESCANSO", "Jueves FIN JORNADA",
-        "Viernes INICIO JORNADA", "Viernes INICIO DESCANSO", "Viernes FIN DESCANSO", "Viernes FIN JORNADA",
-        "Sábado INICIO JORNADA", "Sábado INICIO DESCANSO", "Sábado FIN DESCANSO", "Sábado FIN JORNADA",
-        "Domingo INICIO JORNADA", "Domingo INICIO DESCANSO", "Domingo FIN DESCANSO", "Domingo FIN JORNADA"
-    ]
-    
     # Style headers
+    header_font = Font(bold=True)
+    header_fill = PatternFill(start_color="CCCCCC", end_color="CCCCCC", fill_type="solid")
+    header_alignment = Alignment(horizontal="center")
     for col, header in enumerate(headers, 1):
         cell = ws.cell(row=1, column=col)
         cell.value = header
-        cell.font = Font(bold=True)
-        cell.fill = PatternFill(start_color="CCCCCC", end_color="CCCCCC", fill_type="solid")
-        cell.alignment = Alignment(horizontal="center")
+        cell.font = header_font
+        cell.fill = header_fill
+        cell.alignment = header_alignment
     
     # Adjust column widths
     for col in range(1, len(headers) + 1):
-        ws.column_dimensions[chr(64 + col)].width = 20
+        ws.column_dimensions[get_column_letter(col)].width = 20
     
     # Add sample data row
-    sample_data = [
-        "Juan Pérez", "Administración", "2024-01-01", "2024-12-31",
-        "08:00", "12:00", "13:00", "17:00",  # Lunes
-        "08:00", "12:00", "13:00", "17:00",  # Martes
-        "08:00", "12:00", "13:00", "17:00",  # Miércoles
-        "08:00", "12:00", "13:00", "17:00",  # Jueves
-        "08:00", "12:00", "13:00", "17:00",  # Viernes
-        "", "", "", "",  # Sábado (vacío)
-        "", "", "", ""   # Domingo (vacío)
-    ]
-    
-    for col, value in enumerate(sample_data, 1):
+    sample_font = Font(italic=True, color="666666")
+    for col, value in enumerate(sample_row, 1):
         cell = ws.cell(row=2, column=col)
         cell.value = value
-        cell.font = Font(italic=True, color="666666")
+        cell.font = sample_font
     
-    # Save to BytesIO
     output = io.BytesIO()
     wb.save(output)
-    output.seek(0)
+    return output.getvalue()
+
+# The rendered template is built once per process and kept in memory. openpyxl
+# embeds creation timestamps, so the ETag hashes the bytes actually served.
+template_cache: Dict[str, Any] = {}
+template_lock = asyncio.Lock()
+
+async def get_template() -> tuple:
+    if "content" not in template_cache:
+        async with template_lock:
+            if "content" not in template_cache:
+                content = await run_cpu_bound(build_template_bytes, TEMPLATE_HEADERS, TEMPLATE_SAMPLE_ROW)
+                template_cache.update({
+                    "etag": f'"{hashlib.sha256(content).hexdigest()[:32]}"',
+                    "content": content,
+                })
+    return template_cache["etag"], template_cache["content"]
+
+@api_router.get("/download-template")
+async def download_template(request: Request, current_user: User = Depends(get_current_active_user)):
+    if current_user.role not in [UserRole.ADMIN, UserRole.COORDINATOR]:
+        raise HTTPException(status_code=403, detail="Not enough permissions")
     
-    return StreamingResponse(
-        io.BytesIO(output.read()),
-        media_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
-        headers={"Content-Disposition": "attachment; filename=plantilla_horarios.xlsx"}
-    )
+    etag, content = await get_template()
+    headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+    if etag_matches(request, etag):
+        return Response(status_code=304, headers=headers)
+    
+    headers["Content-Disposition"] = "attachment; filename=plantilla_horarios.xlsx"
+    return Response(content=content, media_type=XLSX_MEDIA_TYPE, headers=headers)
+
+def import_summary(imported_count: int, created_users: int) -> dict:
+    return {
+        "message": f"Procesados {imported_count} horarios. Creados {created_users} nuevos empleados.",
+        "imported_schedules": imported_count,
+        "created_users": created_users
+    }
+
+def temporary_file_path(suffix: str) -> Path:
+    fd, name = tempfile.mkstemp(suffix=suffix)
+    os.close(fd)
+    return Path(name)
+
+def spool_upload(upload: UploadFile, path: Path):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path, "wb") as target:
+        shutil.copyfileobj(upload.file, target)
+
+def read_row_chunk(rows, width: int, size: int) -> list:
+    # Pad or trim rows to the header width; read-only sheets may yield ragged rows
+    return [tuple(islice(chain(row, repeat(None)), width)) for row in islice(rows, size)]
+
+class ImportWriteError(Exception):
+    # Raised when an import fails after some chunks were already saved
+    pass
+
+async def iter_import_frames(ws, columns: list):
+    # Frames are indexed by spreadsheet row number so errors point at the cell
+    rows = ws.iter_rows(min_row=2, values_only=True)
+    first_row = 2
+    while True:
+        chunk = await run_blocking(read_row_chunk, rows, len(columns), IMPORT_BATCH_SIZE)
+        if not chunk:
+            break
+        yield pd.DataFrame(chunk, columns=columns, index=range(first_row, first_row + len(chunk)))
+        first_row += len(chunk)
+
+async def import_schedule_file(path: Path, progress=None) -> dict:
+    # Read-only workbooks stream rows from disk, so only one chunk is held in
+    # memory. The sheet is read twice: every chunk is validated before the
+    # first write so that a bad cell cannot leave a partial import behind.
+    wb = await run_blocking(openpyxl.load_workbook, path, read_only=True, data_only=True)
+    try:
+        ws = wb.worksheets[0]
+        header = await run_blocking(next, ws.iter_rows(max_row=1, values_only=True), None)
+        if header is None:
+            return import_summary(0, 0)
+        columns = [str(value) if value is not None else f"Unnamed: {index}" for index, value in enumerate(header)]
+        total_rows = max((ws.max_row or 0) - 1, 0)
+        
+        processed_rows = 0
+        async for frame in iter_import_frames(ws, columns):
+            await run_blocking(normalize_import_frame, frame)
+            processed_rows += len(frame)
+            if progress and total_rows:
+                await progress(min(processed_rows / total_rows, 1.0) / 2)
+        
+        imported_count = 0
+        created_users = 0
+        processed_rows = 0
+        async for frame in iter_import_frames(ws, columns):
+            try:
+                imported, created = await import_schedule_frame(frame)
+            except Exception as e:
+                raise ImportWriteError(
+                    f"Import stopped at row {frame.index[0]} after saving {imported_count} schedules "
+                    f"and creating {created_users} employees: {e}"
+                ) from e
+            imported_count += imported
+            created_users += created
+            processed_rows += len(frame)
+            if progress and total_rows:
+                await progress(0.5 + min(processed_rows / total_rows, 1.0) / 2)
+    finally:
+        wb.close()
+    
+    return import_summary(imported_count, created_users)
 
 @api_router.post("/import-schedules")
 async def import_schedules(file: UploadFile = File(...), current_user: User = Depends(get_current_active_user)):
@@ -500,176 +1631,413 @@ async def import_schedules(file: UploadFile = File(...), current_user: User = De
     if not file.filename.endswith('.xlsx'):
         raise HTTPException(status_code=400, detail="Only .xlsx files are supported")
     
+    upload_path = temporary_file_path(".xlsx")
     try:
-        contents = await file.read()
-        df = pd.read_excel(io.BytesIO(contents))
-        
-        imported_count = 0
-        created_users = 0
-        
-        for _, row in df.iterrows():
-            # Skip empty rows
-            if pd.isna(row.get("Nombre")) or not row.get("Nombre"):
-                continue
-                
-            employee_name = str(row["Nombre"]).strip()
-            service_name = str(row["Servicio"]).strip()
-            
-            # Check if user exists by name
-            user = await db.users.find_one({"full_name": employee_name})
-            
-            # If user doesn't exist, create them
-            if not user:
-                # Generate username from name
-                username = employee_name.lower().replace(" ", "_").replace(".", "")
-                # Check if username already exists
-                existing_username = await db.users.find_one({"username": username})
-                if existing_username:
-                    username = f"{username}_{str(uuid.uuid4())[:8]}"
-                
-                # Create new user
-                user_data = {
-                    "id": str(uuid.uuid4()),
-                    "username": username,
-                    "email": f"{username}@empresa.com",
-                    "full_name": employee_name,
-                    "password_hash": hash_password("123456"),  # Default password
-                    "role": UserRole.EMPLOYEE,
-                    "service": service_name,
-                    "is_active": True,
-                    "created_at": datetime.utcnow()
-                }
-                
-                await db.users.insert_one(user_data)
-                user = user_data
-                created_users += 1
-            
-            # Create or update schedule
-            schedule_data = {
-                "id": str(uuid.uuid4()),
-                "user_id": user["id"],
-                "service": service_name,
-                "monday_start": str(row.get("Lunes INICIO JORNADA", "")) if not pd.isna(row.get("Lunes INICIO JORNADA")) else None,
-                "monday_break_start": str(row.get("Lunes INICIO DESCANSO", "")) if not pd.isna(row.get("Lunes INICIO DESCANSO")) else None,
-                "monday_break_end": str(row.get("Lunes FIN DESCANSO", "")) if not pd.isna(row.get("Lunes FIN DESCANSO")) else None,
-                "monday_end": str(row.get("Lunes FIN JORNADA", "")) if not pd.isna(row.get("Lunes FIN JORNADA")) else None,
-                "tuesday_start": str(row.get("Martes INICIO JORNADA", "")) if not pd.isna(row.get("Martes INICIO JORNADA")) else None,
-                "tuesday_break_start": str(row.get("Martes INICIO DESCANSO", "")) if not pd.isna(row.get("Martes INICIO DESCANSO")) else None,
-                "tuesday_break_end": str(row.get("Martes FIN DESCANSO", "")) if not pd.isna(row.get("Martes FIN DESCANSO")) else None,
-                "tuesday_end": str(row.get("Martes FIN JORNADA", "")) if not pd.isna(row.get("Martes FIN JORNADA")) else None,
-                "wednesday_start": str(row.get("miercoles INICIO JORNADA", "")) if not pd.isna(row.get("miercoles INICIO JORNADA")) else None,
-                "wednesday_break_start": str(row.get("miercoles INICIO DESCANSO", "")) if not pd.isna(row.get("miercoles INICIO DESCANSO")) else None,
-                "wednesday_break_end": str(row.get("miercoles FIN DESCANSO", "")) if not pd.isna(row.get("miercoles FIN DESCANSO")) else None,
-                "wednesday_end": str(row.get("miercoles FIN JORNADA", "")) if not pd.isna(row.get("miercoles FIN JORNADA")) else None,
-                "thursday_start": str(row.get("Jueves INICIO JORNADA", "")) if not pd.isna(row.get("Jueves INICIO JORNADA")) else None,
-                "thursday_break_start": str(row.get("Jueves INICIO DESCANSO", "")) if not pd.isna(row.get("Jueves INICIO DESCANSO")) else None,
-                "thursday_break_end": str(row.get("Jueves FIN DESCANSO", "")) if not pd.isna(row.get("Jueves FIN DESCANSO")) else None,
-                "thursday_end": str(row.get("Jueves FIN JORNADA", "")) if not pd.isna(row.get("Jueves FIN JORNADA")) else None,
-                "friday_start": str(row.get("Viernes INICIO JORNADA", "")) if not pd.isna(row.get("Viernes INICIO JORNADA")) else None,
-                "friday_break_start": str(row.get("Viernes INICIO DESCANSO", "")) if not pd.isna(row.get("Viernes INICIO DESCANSO")) else None,
-                "friday_break_end": str(row.get("Viernes FIN DESCANSO", "")) if not pd.isna(row.get("Viernes FIN DESCANSO")) else None,
-                "friday_end": str(row.get("Viernes FIN JORNADA", "")) if not pd.isna(row.get("Viernes FIN JORNADA")) else None,
-                "saturday_start": str(row.get("Sábado INICIO JORNADA", "")) if not pd.isna(row.get("Sábado INICIO JORNADA")) else None,
-                "saturday_break_start": str(row.get("Sábado INICIO DESCANSO", "")) if not pd.isna(row.get("Sábado INICIO DESCANSO")) else None,
-                "saturday_break_end": str(row.get("Sábado FIN DESCANSO", "")) if not pd.isna(row.get("Sábado FIN DESCANSO")) else None,
-                "saturday_end": str(row.get("Sábado FIN JORNADA", "")) if not pd.isna(row.get("Sábado FIN JORNADA")) else None,
-                "sunday_start": str(row.get("Domingo INICIO JORNADA", "")) if not pd.isna(row.get("Domingo INICIO JORNADA")) else None,
-                "sunday_break_start": str(row.get("Domingo INICIO DESCANSO", "")) if not pd.isna(row.get("Domingo INICIO DESCANSO")) else None,
-                "sunday_break_end": str(row.get("Domingo FIN DESCANSO", "")) if not pd.isna(row.get("Domingo FIN DESCANSO")) else None,
-                "sunday_end": str(row.get("Domingo FIN JORNADA", "")) if not pd.isna(row.get("Domingo FIN JORNADA")) else None,
-                "created_at": datetime.utcnow()
-            }
-            
-            # Clean empty string values
-            for key, value in schedule_data.items():
-                if value == "" or value == "nan":
-                    schedule_data[key] = None
-            
-            # Update or create schedule
-            await db.schedules.update_one(
-                {"user_id": user["id"]},
-                {"$set": schedule_data},
-                upsert=True
-            )
-            imported_count += 1
-        
-        return {
-            "message": f"Procesados {imported_count} horarios. Creados {created_users} nuevos empleados.",
-            "imported_schedules": imported_count,
-            "created_users": created_users
-        }
+        await run_blocking(spool_upload, file, upload_path)
+        return await import_schedule_file(upload_path)
     
+    except ImportWriteError as e:
+        raise HTTPException(status_code=500, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=400, detail=f"Error processing file: {str(e)}")
+    finally:
+        upload_path.unlink(missing_ok=True)
+
+# Spreadsheet column -> exported field
+EXPORT_COLUMNS = {
+    "Nombre": "full_name",
+    "Servicio": "service",
+    "Desde": "desde",
+    "Hasta": "hasta",
+    **SCHEDULE_TIME_COLUMNS,
+}
+
+def schedule_export_pipeline() -> list:
+    # Join each schedule with its user and keep only the exported fields;
+    # schedules whose user no longer exists are skipped
+    projection = {"_id": 0, "full_name": "$user.full_name", "shifts": 1}
+    projection.update({field: 1 for field in EXPORT_COLUMNS.values() if field != "full_name"})
+    return [
+        {"$lookup": {"from": "users", "localField": "user_id", "foreignField": "id", "as": "user"}},
+        {"$unwind": "$user"},
+        {"$project": projection},
+    ]
+
+class ExportFormat(str, Enum):
+    XLSX = "xlsx"
+    CSV = "csv"
+
+EXPORT_BATCH_SIZE = 1000
+
+async def iter_export_batches():
+    batch = []
+    async for schedule in db.schedules.aggregate(schedule_export_pipeline(), batchSize=EXPORT_BATCH_SIZE):
+        view = schedule_view(schedule)
+        batch.append([view.get(field, "") for field in EXPORT_COLUMNS.values()])
+        if len(batch) >= EXPORT_BATCH_SIZE:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+def append_rows(ws, rows: list):
+    for row in rows:
+        ws.append(row)
+
+async def write_schedule_export(path: Path):
+    # Write-only workbooks keep rows on disk instead of building the sheet in memory
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet("Sheet1")
+    ws.append(list(EXPORT_COLUMNS))
+    async for batch in iter_export_batches():
+        await run_blocking(append_rows, ws, batch)
+    await run_blocking(wb.save, path)
+
+async def iter_schedule_csv():
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    # BOM so that Excel opens the accented headers as UTF-8
+    buffer.write("\ufeff")
+    writer.writerow(EXPORT_COLUMNS)
+    async for batch in iter_export_batches():
+        writer.writerows(batch)
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue()
+
+async def write_schedule_csv(path: Path):
+    with open(path, "w", encoding="utf-8", newline="") as target:
+        async for chunk in iter_schedule_csv():
+            await run_blocking(target.write, chunk)
+
+EXPORT_WRITERS = {ExportFormat.XLSX: write_schedule_export, ExportFormat.CSV: write_schedule_csv}
+EXPORT_MEDIA_TYPES = {ExportFormat.XLSX: XLSX_MEDIA_TYPE, ExportFormat.CSV: "text/csv; charset=utf-8"}
+
+# Rendered exports are kept on disk per schedules dataset version and reused
+# until a write bumps the version
+EXPORT_CACHE_DIR = Path(os.environ.get('EXPORT_CACHE_DIR', ROOT_DIR / 'export_cache'))
+export_cache: Dict[ExportFormat, dict] = {}
+export_locks = {export_format: asyncio.Lock() for export_format in ExportFormat}
+EXPORT_FILE_PATTERN = re.compile(r"^horarios-v(\d+)\.")
+PARTIAL_EXPORT_TTL_SECONDS = 3600
+
+def prune_export_cache(version: int):
+    # Keep the previous version for workers that have not seen the bump yet;
+    # partial files are only left behind by interrupted renders
+    cutoff = time.time() - PARTIAL_EXPORT_TTL_SECONDS
+    for path in EXPORT_CACHE_DIR.iterdir():
+        match = EXPORT_FILE_PATTERN.match(path.name)
+        try:
+            if match and int(match.group(1)) < version - 1:
+                path.unlink()
+            elif path.suffix == ".partial" and path.stat().st_mtime < cutoff:
+                path.unlink()
+        except FileNotFoundError:
+            pass
+
+async def get_cached_export(export_format: ExportFormat) -> dict:
+    dataset = await get_dataset_version(SCHEDULES_DATASET)
+    entry = export_cache.get(export_format)
+    if entry and entry["version"] == dataset["version"] and entry["path"].exists():
+        return entry
+    
+    async with export_locks[export_format]:
+        entry = export_cache.get(export_format)
+        if entry and entry["version"] == dataset["version"] and entry["path"].exists():
+            return entry
+        
+        EXPORT_CACHE_DIR.mkdir(parents=True, exist_ok=True)
+        path = EXPORT_CACHE_DIR / f"horarios-v{dataset['version']}.{export_format.value}"
+        # Another worker (or this one before a restart) may have rendered this version already
+        if not path.exists():
+            # Render under a private name, then move into place so other workers never see a partial file
+            partial_path = EXPORT_CACHE_DIR / f"{uuid.uuid4()}.partial"
+            try:
+                await EXPORT_WRITERS[export_format](partial_path)
+                partial_path.replace(path)
+            finally:
+                partial_path.unlink(missing_ok=True)
+            
+            await run_blocking(prune_export_cache, dataset["version"])
+        entry = {
+            "version": dataset["version"],
+            "path": path,
+            "etag": f'"schedules-v{dataset["version"]}-{export_format.value}"',
+            "last_modified": dataset["updated_at"],
+        }
+        export_cache[export_format] = entry
+        return entry
 
 @api_router.get("/export-schedules")
-async def export_schedules(current_user: User = Depends(get_current_active_user)):
+async def export_schedules(
+    request: Request,
+    export_format: ExportFormat = Query(ExportFormat.XLSX, alias="format"),
+    current_user: User = Depends(get_current_active_user)
+):
     if current_user.role not in [UserRole.ADMIN, UserRole.COORDINATOR]:
         raise HTTPException(status_code=403, detail="Not enough permissions")
     
-    # Get all schedules with user info
-    schedules = await db.schedules.find().to_list(1000)
-    data = []
-    
-    for schedule in schedules:
-        user = await db.users.find_one({"id": schedule["user_id"]})
-        if user:
-            data.append({
-                "Nombre": user["full_name"],
-                "Servicio": schedule["service"],
-                "Desde": schedule.get("desde", ""),
-                "Hasta": schedule.get("hasta", ""),
-                "Lunes INICIO JORNADA": schedule.get("monday_start", ""),
-                "Lunes INICIO DESCANSO": schedule.get("monday_break_start", ""),
-                "Lunes FIN DESCANSO": schedule.get("monday_break_end", ""),
-                "Lunes FIN JORNADA": schedule.get("monday_end", ""),
-                "Martes INICIO JORNADA": schedule.get("tuesday_start", ""),
-                "Martes INICIO DESCANSO": schedule.get("tuesday_break_start", ""),
-                "Martes FIN DESCANSO": schedule.get("tuesday_break_end", ""),
-                "Martes FIN JORNADA": schedule.get("tuesday_end", ""),
-                "miercoles INICIO JORNADA": schedule.get("wednesday_start", ""),
-                "miercoles INICIO DESCANSO": schedule.get("wednesday_break_start", ""),
-                "miercoles FIN DESCANSO": schedule.get("wednesday_break_end", ""),
-                "miercoles FIN JORNADA": schedule.get("wednesday_end", ""),
-                "Jueves INICIO JORNADA": schedule.get("thursday_start", ""),
-                "Jueves INICIO DESCANSO": schedule.get("thursday_break_start", ""),
-                "Jueves FIN DESCANSO": schedule.get("thursday_break_end", ""),
-                "Jueves FIN JORNADA": schedule.get("thursday_end", ""),
-                "Viernes INICIO JORNADA": schedule.get("friday_start", ""),
-                "Viernes INICIO DESCANSO": schedule.get("friday_break_start", ""),
-                "Viernes FIN DESCANSO": schedule.get("friday_break_end", ""),
-                "Viernes FIN JORNADA": schedule.get("friday_end", ""),
-                "Sábado INICIO JORNADA": schedule.get("saturday_start", ""),
-                "Sábado INICIO DESCANSO": schedule.get("saturday_break_start", ""),
-                "Sábado FIN DESCANSO": schedule.get("saturday_break_end", ""),
-                "Sábado FIN JORNADA": schedule.get("saturday_end", ""),
-                "Domingo INICIO JORNADA": schedule.get("sunday_start", ""),
-                "Domingo INICIO DESCANSO": schedule.get("sunday_break_start", ""),
-                "Domingo FIN DESCANSO": schedule.get("sunday_break_end", ""),
-                "Domingo FIN JORNADA": schedule.get("sunday_end", ""),
-            })
+    entry = await get_cached_export(export_format)
+    headers = {"ETag": entry["etag"], "Cache-Control": "private, no-cache"}
+    if entry["last_modified"]:
+        headers["Last-Modified"] = http_date(entry["last_modified"])
+    if etag_matches(request, entry["etag"]) or not_modified_since(request, entry["last_modified"]):
+        return Response(status_code=304, headers=headers)
     
-    df = pd.DataFrame(data)
-    output = io.BytesIO()
-    df.to_excel(output, index=False)
-    output.seek(0)
+    return FileResponse(
+        entry["path"],
+        media_type=EXPORT_MEDIA_TYPES[export_format],
+        filename=f"horarios_exportados.{export_format.value}",
+        headers=headers
+    )
+
+# Background Job Routes
+# Imports and exports can run as jobs: submitting returns immediately, the
+# work runs on a bounded pool and progress/results are kept in db.jobs.
+# Each process heartbeats the jobs it owns; jobs whose owner stopped
+# heartbeating are failed by whichever worker notices first.
+JOB_WORKERS = int(os.environ.get('JOB_WORKERS', 2))
+# Always below the pool size, so one user cannot take every slot
+JOB_MAX_ACTIVE_PER_USER = max(1, min(int(os.environ.get('JOB_MAX_ACTIVE_PER_USER', JOB_WORKERS - 1)), JOB_WORKERS - 1))
+JOB_FILES_DIR = Path(os.environ.get('JOB_FILES_DIR', ROOT_DIR / 'job_files'))
+JOB_HEARTBEAT_SECONDS = float(os.environ.get('JOB_HEARTBEAT_SECONDS', 30))
+JOB_STALE_SECONDS = 3 * JOB_HEARTBEAT_SECONDS
+JOB_FILE_TTL_SECONDS = float(os.environ.get('JOB_FILE_TTL_SECONDS', 24 * 3600))
+JOB_INSTANCE_ID = str(uuid.uuid4())
+ACTIVE_JOB_STATUSES = ["queued", "running"]
+
+job_slots = asyncio.Semaphore(JOB_WORKERS)
+running_jobs = set()
+maintenance_tasks = set()
+
+class JobType(str, Enum):
+    IMPORT_SCHEDULES = "import_schedules"
+    EXPORT_SCHEDULES = "export_schedules"
+
+class JobStatus(str, Enum):
+    QUEUED = "queued"
+    RUNNING = "running"
+    COMPLETED = "completed"
+    FAILED = "failed"
+
+class Job(BaseModel):
+    id: str = Field(default_factory=lambda: str(uuid.uuid4()))
+    type: JobType
+    status: JobStatus = JobStatus.QUEUED
+    progress: float = 0.0
+    result: Optional[Dict[str, Any]] = None
+    error: Optional[str] = None
+    created_by: str
+    created_at: datetime = Field(default_factory=datetime.utcnow)
+    updated_at: datetime = Field(default_factory=datetime.utcnow)
+
+async def update_job(job_id: str, **fields):
+    fields["updated_at"] = datetime.utcnow()
+    await db.jobs.update_one({"id": job_id}, {"$set": fields})
+
+async def run_job(job: Job, work):
+    async with job_slots:
+        await update_job(job.id, status=JobStatus.RUNNING.value)
+        
+        async def progress(value: float):
+            await update_job(job.id, progress=round(value, 4))
+        
+        try:
+            result = await work(job.id, progress)
+        except Exception as e:
+            logger.exception(f"Job {job.id} failed")
+            await update_job(job.id, status=JobStatus.FAILED.value, error=str(e))
+        else:
+            await update_job(job.id, status=JobStatus.COMPLETED.value, progress=1.0, result=result)
+
+async def reserve_job(job_type: JobType, current_user: User) -> Job:
+    # Insert first, then rank the job among the user's active ones: of two
+    # concurrent submissions only the later one can exceed the limit
+    now = datetime.utcnow()
+    job = Job(type=job_type, created_by=current_user.id, created_at=now.replace(microsecond=now.microsecond // 1000 * 1000))
+    await db.jobs.insert_one({**job.dict(), "instance_id": JOB_INSTANCE_ID, "heartbeat_at": now})
+    rank = await db.jobs.count_documents({
+        "created_by": current_user.id,
+        "status": {"$in": ACTIVE_JOB_STATUSES},
+        "$or": [
+            {"created_at": {"$lt": job.created_at}},
+            {"created_at": job.created_at, "id": {"$lte": job.id}},
+        ]
+    })
+    if rank > JOB_MAX_ACTIVE_PER_USER:
+        await db.jobs.delete_one({"id": job.id})
+        raise HTTPException(status_code=429, detail="Too many jobs in progress")
+    return job
+
+def start_job(job: Job, work):
+    task = asyncio.create_task(run_job(job, work))
+    running_jobs.add(task)
+    task.add_done_callback(running_jobs.discard)
+
+async def submit_job(job_type: JobType, current_user: User, work) -> Job:
+    job = await reserve_job(job_type, current_user)
+    start_job(job, work)
+    return job
+
+def job_file_path(job_id: str, suffix: str) -> Path:
+    return JOB_FILES_DIR / f"{job_id}{suffix}"
+
+async def get_job_document(job_id: str, current_user: User) -> dict:
+    job = await db.jobs.find_one({"id": job_id})
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    if current_user.role != UserRole.ADMIN and job["created_by"] != current_user.id:
+        raise HTTPException(status_code=403, detail="Not enough permissions")
+    return job
+
+@api_router.post("/jobs/import-schedules", response_model=Job, status_code=202)
+async def submit_import_job(file: UploadFile = File(...), current_user: User = Depends(get_current_active_user)):
+    if current_user.role not in [UserRole.ADMIN, UserRole.COORDINATOR]:
+        raise HTTPException(status_code=403, detail="Not enough permissions")
     
-    return StreamingResponse(
-        io.BytesIO(output.read()),
-        media_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
-        headers={"Content-Disposition": "attachment; filename=horarios_exportados.xlsx"}
+    if not file.filename.endswith('.xlsx'):
+        raise HTTPException(status_code=400, detail="Only .xlsx files are supported")
+    
+    job = await reserve_job(JobType.IMPORT_SCHEDULES, current_user)
+    
+    # The upload is closed once the request finishes, so keep a copy on disk
+    upload_path = job_file_path(job.id, "-upload.xlsx")
+    try:
+        await run_blocking(spool_upload, file, upload_path)
+    except BaseException:
+        upload_path.unlink(missing_ok=True)
+        await db.jobs.delete_one({"id": job.id})
+        raise
+    
+    async def work(job_id: str, progress):
+        try:
+            return await import_schedule_file(upload_path, progress)
+        finally:
+            upload_path.unlink(missing_ok=True)
+    
+    start_job(job, work)
+    return job
+
+@api_router.post("/jobs/export-schedules", response_model=Job, status_code=202)
+async def submit_export_job(current_user: User = Depends(get_current_active_user)):
+    if current_user.role not in [UserRole.ADMIN, UserRole.COORDINATOR]:
+        raise HTTPException(status_code=403, detail="Not enough permissions")
+    
+    async def work(job_id: str, progress):
+        result_path = job_file_path(job_id, ".xlsx")
+        result_path.parent.mkdir(parents=True, exist_ok=True)
+        await write_schedule_export(result_path)
+        await update_job(job_id, result_file=str(result_path))
+        return {"filename": "horarios_exportados.xlsx", "size": result_path.stat().st_size}
+    
+    return await submit_job(JobType.EXPORT_SCHEDULES, current_user, work)
+
+@api_router.get("/jobs/{job_id}", response_model=Job)
+async def get_job(job_id: str, current_user: User = Depends(get_current_active_user)):
+    return Job(**await get_job_document(job_id, current_user))
+
+@api_router.get("/jobs/{job_id}/result")
+async def download_job_result(job_id: str, current_user: User = Depends(get_current_active_user)):
+    job = await get_job_document(job_id, current_user)
+    if job["status"] != JobStatus.COMPLETED:
+        raise HTTPException(status_code=409, detail="Job has not completed")
+    if not job.get("result_file") or not Path(job["result_file"]).exists():
+        raise HTTPException(status_code=404, detail="Job has no downloadable result")
+    
+    return FileResponse(job["result_file"], media_type=XLSX_MEDIA_TYPE, filename=job["result"]["filename"])
+
+async def heartbeat_jobs():
+    await db.jobs.update_many(
+        {"instance_id": JOB_INSTANCE_ID, "status": {"$in": ACTIVE_JOB_STATUSES}},
+        {"$set": {"heartbeat_at": datetime.utcnow()}}
+    )
+
+async def fail_stale_jobs():
+    # Jobs live in the process that accepted them; a missing heartbeat means
+    # that process died
+    now = datetime.utcnow()
+    await db.jobs.update_many(
+        {
+            "status": {"$in": ACTIVE_JOB_STATUSES},
+            "$or": [
+                {"heartbeat_at": {"$lt": now - timedelta(seconds=JOB_STALE_SECONDS)}},
+                {"heartbeat_at": {"$exists": False}},
+            ]
+        },
+        {"$set": {"status": JobStatus.FAILED.value, "error": "Interrupted by server restart", "updated_at": now}}
     )
 
+def remove_expired_job_files():
+    # Uploads and results older than the TTL; downloads of expired results 404
+    if not JOB_FILES_DIR.exists():
+        return
+    cutoff = time.time() - JOB_FILE_TTL_SECONDS
+    for path in JOB_FILES_DIR.iterdir():
+        try:
+            if path.is_file() and path.stat().st_mtime < cutoff:
+                path.unlink()
+        except FileNotFoundError:
+            pass
+
+async def job_maintenance():
+    while True:
+        try:
+            await heartbeat_jobs()
+            await fail_stale_jobs()
+            await run_blocking(remove_expired_job_files)
+        except Exception:
+            logger.exception("Job maintenance failed")
+        await asyncio.sleep(JOB_HEARTBEAT_SECONDS)
+
 # Configuration Routes
+# The configuration is cached per "configuration" dataset version, so steady
+# state reads cost no queries beyond the shared version check
+CONFIGURATION_DATASET = "configuration"
+# The configuration lives under a fixed _id so that concurrent upserts hit the
+# unique _id index instead of inserting one document each
+CONFIGURATION_ID = "default"
+configuration_cache: Dict[str, Any] = {}
+
+def cache_configuration(config: Configuration, version: int) -> dict:
+    body = config.json()
+    configuration_cache.update({
+        "version": version,
+        "config": config,
+        "etag": f'"{hashlib.sha256(body.encode()).hexdigest()[:32]}"',
+    })
+    return configuration_cache
+
+async def get_cached_configuration() -> dict:
+    dataset = await get_dataset_version(CONFIGURATION_DATASET)
+    if configuration_cache.get("version") == dataset["version"]:
+        return configuration_cache
+    
+    config = await db.configurations.find_one({"_id": CONFIGURATION_ID})
+    if config is None:
+        # Seed from a document written before the fixed _id, or the defaults
+        legacy = await db.configurations.find_one({"_id": {"$ne": CONFIGURATION_ID}}, {"_id": 0})
+        try:
+            config = await db.configurations.find_one_and_update(
+                {"_id": CONFIGURATION_ID},
+                {"$setOnInsert": legacy or Configuration().dict()},
+                upsert=True,
+                return_document=ReturnDocument.AFTER
+            )
+        except DuplicateKeyError:
+            config = await db.configurations.find_one({"_id": CONFIGURATION_ID})
+    return cache_configuration(Configuration(**config), dataset["version"])
+
 @api_router.get("/configuration", response_model=Configuration)
-async def get_configuration():
-    config = await db.configurations.find_one()
-    if not config:
-        # Create default configuration
-        default_config = Configuration()
-        await db.configurations.insert_one(default_config.dict())
-        return default_config
-    return Configuration(**config)
+async def get_configuration(request: Request, response: Response):
+    cached = await get_cached_configuration()
+    headers = {"ETag": cached["etag"], "Cache-Control": "public, no-cache"}
+    if etag_matches(request, cached["etag"]):
+        return Response(status_code=304, headers=headers)
+    
+    response.headers.update(headers)
+    return cached["config"]
 
 @api_router.put("/configuration", response_model=Configuration)
 async def update_configuration(config_data: Configuration, current_user: User = Depends(get_current_active_user)):
@@ -678,18 +2046,728 @@ async def update_configuration(config_data: Configuration, current_user: User =
     
     config_data.updated_at = datetime.utcnow()
     await db.configurations.update_one(
-        {},
+        {"_id": CONFIGURATION_ID},
         {"$set": config_data.dict()},
         upsert=True
     )
+    # Reload from the database on the next read so every worker hashes the same stored document
+    await bump_dataset_version(CONFIGURATION_DATASET)
+    configuration_cache.clear()
     return config_data
 
 # Services Routes
+# db.services is a materialized catalog: one document per service with its
+# user and employee counts, kept up to date by every write to db.users
+def service_count_update(service: str, users: int, employees: int) -> UpdateOne:
+    return UpdateOne({"_id": service}, {"$inc": {"user_count": users, "employee_count": employees}}, upsert=True)
+
+async def adjust_service_counts(counts: Dict[str, tuple]):
+    # counts maps service -> (user delta, employee delta)
+    operations = [
+        service_count_update(service, users, employees)
+        for service, (users, employees) in counts.items() if service
+    ]
+    if not operations:
+        return
+    await db.services.bulk_write(operations, ordered=False)
+    await db.services.delete_many({"user_count": {"$lte": 0}})
+
+async def track_user_service(user: dict, sign: int = 1):
+    is_employee = user.get("role") == UserRole.EMPLOYEE
+    await adjust_service_counts({user.get("service"): (sign, sign if is_employee else 0)})
+
+async def rebuild_service_catalog():
+    pipeline = [
+        {"$match": {"service": {"$nin": [None, ""]}}},
+        {"$group": {
+            "_id": "$service",
+            "user_count": {"$sum": 1},
+            "employee_count": {"$sum": {"$cond": [{"$eq": ["$role", UserRole.EMPLOYEE.value]}, 1, 0]}},
+        }},
+    ]
+    services = await db.users.aggregate(pipeline).to_list(None)
+    # Upserts keep concurrent rebuilds (several workers starting at once) idempotent
+    if services:
+        await db.services.bulk_write([
+            UpdateOne(
+                {"_id": service["_id"]},
+                {"$set": {"user_count": service["user_count"], "employee_count": service["employee_count"]}},
+                upsert=True
+            )
+            for service in services
+        ], ordered=False)
+    await db.services.delete_many({"_id": {"$nin": [service["_id"] for service in services]}})
+
 @api_router.get("/services")
 async def get_services(current_user: User = Depends(get_current_active_user)):
-    users = await db.users.find().to_list(1000)
-    services = list(set([user["service"] for user in users if user.get("service")]))
-    return {"services": services}
+    services = await db.services.find().sort("_id", ASCENDING).to_list(None)
+    result = {"services": [service["_id"] for service in services]}
+    # Head counts are roster data, only shown to admins and coordinators
+    if current_user.role in [UserRole.ADMIN, UserRole.COORDINATOR]:
+        result["employee_counts"] = {service["_id"]: service["employee_count"] for service in services}
+    return result
+
+def service_members_query(service: str, current_user: User) -> dict:
+    # Admin accounts and the caller are never touched by bulk operations
+    return {"service": service, "role": {"$ne": UserRole.ADMIN.value}, "id": {"$ne": current_user.id}}
+
+@api_router.post("/services/{service}/deactivate")
+async def deactivate_service_users(service: str, current_user: User = Depends(get_current_active_user)):
+    if current_user.role not in [UserRole.ADMIN, UserRole.COORDINATOR]:
+        raise HTTPException(status_code=403, detail="Not enough permissions")
+    
+    query = {**service_members_query(service, current_user), "is_active": True}
+    users = await db.users.find(query, {"_id": 0, "username": 1}).to_list(None)
+    if not users:
+        return {"deactivated": 0}
+    result = await db.users.update_many(query, {"$set": {"is_active": False}})
+    await invalidate_principal(*(user["username"] for user in users))
+    await schedules_changed()
+    return {"deactivated": result.modified_count}
+
+@api_router.delete("/services/{service}/users")
+async def delete_service_users(service: str, current_user: User = Depends(get_current_active_user)):
+    if current_user.role not in [UserRole.ADMIN, UserRole.COORDINATOR]:
+        raise HTTPException(status_code=403, detail="Not enough permissions")
+    
+    users = await db.users.find(
+        service_members_query(service, current_user),
+        {"_id": 0, "id": 1, "username": 1, "service": 1, "role": 1}
+    ).to_list(None)
+    deleted = await cascade_delete_users(users)
+    return {"deleted": deleted}
+
+# Coverage Routes
+# In-memory interval index over the weekly shifts. Each working interval is a
+# [start, end) range in minutes since Monday 00:00; breaks split a day into two
+# intervals and shifts ending before they start run past midnight. Lookups
+# binary-search the sorted start array and filter the candidates with numpy.
+MINUTES_PER_WEEK = len(DAYS) * MINUTES_PER_DAY
+SCHEDULE_TIMEZONE = ZoneInfo(os.environ.get('SCHEDULE_TIMEZONE', 'UTC'))
+
+def day_intervals(day_index: int, points: list) -> list:
+    start, break_start, break_end, end = points
+    if start is None or end is None:
+        return []
+    # Times earlier than the start belong to the next day
+    def offset(minutes):
+        return minutes + MINUTES_PER_DAY if minutes < start else minutes
+    end = offset(end)
+    if end == start:
+        return []
+    ranges = [(start, end)]
+    if break_start is not None and break_end is not None:
+        break_start, break_end = offset(break_start), offset(break_end)
+        if start <= break_start < break_end <= end:
+            ranges = [(start, break_start), (break_end, end)]
+    
+    intervals = []
+    base = day_index * MINUTES_PER_DAY
+    for range_start, range_end in ranges:
+        if range_start == range_end:
+            continue
+        range_start, range_end = base + range_start, base + range_end
+        # Sunday night shifts wrap around to Monday morning
+        if range_start >= MINUTES_PER_WEEK:
+            intervals.append((range_start - MINUTES_PER_WEEK, range_end - MINUTES_PER_WEEK))
+            continue
+        if range_end > MINUTES_PER_WEEK:
+            intervals.append((0, range_end - MINUTES_PER_WEEK))
+            range_end = MINUTES_PER_WEEK
+        intervals.append((range_start, range_end))
+    return intervals
+
+def shift_intervals(shifts: list) -> list:
+    return [
+        interval
+        for day_index, points in enumerate(shifts)
+        for interval in day_intervals(day_index, points)
+    ]
+
+def coverage_entry(document: dict) -> dict:
+    shifts = document.get("shifts") or legacy_shifts(document)
+    return {
+        "user_id": document["user_id"],
+        "service": document.get("service"),
+        "intervals": shift_intervals(shifts),
+    }
+
+def build_coverage_arrays(entries: list) -> dict:
+    # entries is a list of (schedule id, entry). Owners are positions in
+    # user_ids; owner_of maps schedule ids to them for incremental deletes.
+    user_ids = []
+    owner_of: Dict[str, int] = {}
+    service_codes: Dict[str, int] = {}
+    owner_services = []
+    starts, ends, owners = [], [], []
+    for schedule_id, entry in entries:
+        owner = len(user_ids)
+        owner_of[schedule_id] = owner
+        user_ids.append(entry["user_id"])
+        owner_services.append(service_codes.setdefault(entry["service"], len(service_codes)))
+        for start, end in entry["intervals"]:
+            starts.append(start)
+            ends.append(end)
+            owners.append(owner)
+    order = np.argsort(np.array(starts, dtype=np.int32), kind="stable")
+    starts = np.array(starts, dtype=np.int32)[order]
+    ends = np.array(ends, dtype=np.int32)[order]
+    return {
+        "starts": starts,
+        "ends": ends,
+        "owners": np.array(owners, dtype=np.int32)[order],
+        "max_length": int((ends - starts).max()) if len(starts) else 0,
+        "user_ids": user_ids,
+        "owner_of": owner_of,
+        "service_codes": service_codes,
+        "owner_services": np.array(owner_services, dtype=np.int32),
+        "dead_owners": 0,
+    }
+
+def load_coverage(documents: list) -> tuple:
+    entries = {document["id"]: coverage_entry(document) for document in documents}
+    return entries, build_coverage_arrays(list(entries.items()))
+
+class CoverageIndex:
+    # Local writes update the sorted arrays in place; full loads and
+    # compactions are built on the thread pool and swapped in. generation
+    # counts local writes so a build that raced with one is not swapped in.
+    def __init__(self):
+        self.version = None
+        self.generation = 0
+        self.entries: Dict[str, dict] = {}
+        self.schedule_by_user: Dict[str, str] = {}
+        self.lock = asyncio.Lock()
+        self._arrays = None
+
+    def upsert(self, document: dict):
+        self.remove(document["id"])
+        entry = coverage_entry(document)
+        self.entries[document["id"]] = entry
+        self.schedule_by_user[document["user_id"]] = document["id"]
+        if self._arrays is not None:
+            self._insert(document["id"], entry)
+        self.generation += 1
+
+    def remove(self, schedule_id: str):
+        entry = self.entries.pop(schedule_id, None)
+        if entry and self.schedule_by_user.get(entry["user_id"]) == schedule_id:
+            del self.schedule_by_user[entry["user_id"]]
+        if entry and self._arrays is not None:
+            self._delete(schedule_id)
+        self.generation += 1
+
+    def remove_user(self, user_id: str):
+        schedule_id = self.schedule_by_user.get(user_id)
+        if schedule_id:
+            self.remove(schedule_id)
+
+    def _insert(self, schedule_id: str, entry: dict):
+        arrays = self._arrays
+        owner = len(arrays["user_ids"])
+        arrays["user_ids"].append(entry["user_id"])
+        arrays["owner_of"][schedule_id] = owner
+        code = arrays["service_codes"].setdefault(entry["service"], len(arrays["service_codes"]))
+        arrays["owner_services"] = np.append(arrays["owner_services"], np.int32(code))
+        if not entry["intervals"]:
+            return
+        intervals = np.array(sorted(entry["intervals"]), dtype=np.int32)
+        positions = np.searchsorted(arrays["starts"], intervals[:, 0], side="right")
+        arrays["starts"] = np.insert(arrays["starts"], positions, intervals[:, 0])
+        arrays["ends"] = np.insert(arrays["ends"], positions, intervals[:, 1])
+        arrays["owners"] = np.insert(arrays["owners"], positions, owner)
+        arrays["max_length"] = max(arrays["max_length"], int((intervals[:, 1] - intervals[:, 0]).max()))
+
+    def _delete(self, schedule_id: str):
+        arrays = self._arrays
+        owner = arrays["owner_of"].pop(schedule_id, None)
+        if owner is None:
+            return
+        keep = arrays["owners"] != owner
+        for key in ("starts", "ends", "owners"):
+            arrays[key] = arrays[key][keep]
+        arrays["user_ids"][owner] = None
+        arrays["dead_owners"] += 1
+
+    def sync(self, version: int):
+        # Local writes are applied incrementally; any gap means another worker
+        # (or a bulk import) changed schedules and the index must be reloaded
+        self.version = version if self.version == version - 1 else None
+
+    async def load(self, version: int):
+        generation = self.generation
+        projection = {"_id": 0, "id": 1, "user_id": 1, "service": 1, "shifts": 1, **{field: 1 for field in SCHEDULE_TIME_FIELDS}}
+        documents = await db.schedules.find({}, projection).batch_size(EXPORT_BATCH_SIZE).to_list(None)
+        entries, arrays = await run_blocking(load_coverage, documents)
+        self.entries = entries
+        self.schedule_by_user = {entry["user_id"]: schedule_id for schedule_id, entry in entries.items()}
+        self._arrays = arrays
+        # A local write during the load may be missing from the snapshot
+        self.version = version if self.generation == generation else None
+
+    def needs_compaction(self) -> bool:
+        return self._arrays is not None and self._arrays["dead_owners"] > max(1000, len(self.entries))
+
+    async def compact(self):
+        generation = self.generation
+        arrays = await run_blocking(build_coverage_arrays, list(self.entries.items()))
+        if self.generation == generation:
+            self._arrays = arrays
+
+    def arrays(self) -> dict:
+        if self._arrays is None:
+            self._arrays = build_coverage_arrays(list(self.entries.items()))
+        return self._arrays
+
+    def at(self, minute_of_week: int, service: Optional[str] = None) -> List[str]:
+        return self.between(minute_of_week, minute_of_week + 1, service)
+
+    def between(self, start: int, end: int, service: Optional[str] = None) -> List[str]:
+        # Users working at some minute of [start, end)
+        arrays = self.arrays()
+        lo = np.searchsorted(arrays["starts"], start - arrays["max_length"], side="right")
+        hi = np.searchsorted(arrays["starts"], end, side="left")
+        owners = arrays["owners"][lo:hi][arrays["ends"][lo:hi] > start]
+        if service is not None:
+            owners = owners[arrays["owner_services"][owners] == arrays["service_codes"].get(service, -1)]
+        return [arrays["user_ids"][owner] for owner in np.unique(owners)]
+
+coverage_index = CoverageIndex()
+
+async def get_coverage_index() -> CoverageIndex:
+    dataset = await get_dataset_version(SCHEDULES_DATASET)
+    if coverage_index.version != dataset["version"]:
+        async with coverage_index.lock:
+            if coverage_index.version != dataset["version"]:
+                await coverage_index.load(dataset["version"])
+    elif coverage_index.needs_compaction():
+        async with coverage_index.lock:
+            if coverage_index.needs_compaction():
+                await coverage_index.compact()
+    return coverage_index
+
+async def schedules_changed(upserted: list = (), removed_ids: list = (), removed_user_ids: list = ()):
+    # Apply a local schedule write to the in-memory index and bump the dataset version
+    for schedule_id in removed_ids:
+        coverage_index.remove(schedule_id)
+    for user_id in removed_user_ids:
+        coverage_index.remove_user(user_id)
+    for document in upserted:
+        coverage_index.upsert(document)
+    dataset = await bump_dataset_version(SCHEDULES_DATASET)
+    coverage_index.sync(dataset["version"])
+
+def minute_of_week(moment: datetime) -> int:
+    return moment.weekday() * MINUTES_PER_DAY + moment.hour * 60 + moment.minute
+
+class CoverageEmployee(BaseModel):
+    id: str
+    full_name: str
+    service: str
+
+class CoverageAt(BaseModel):
+    at: datetime
+    day: DayOfWeek
+    time: str
+    count: int
+    employees: List[CoverageEmployee]
+
+@api_router.get("/coverage/at", response_model=CoverageAt)
+async def get_coverage_at(
+    ts: Optional[datetime] = None,
+    service: Optional[str] = None,
+    current_user: User = Depends(get_current_active_user)
+):
+    if current_user.role not in [UserRole.ADMIN, UserRole.COORDINATOR]:
+        raise HTTPException(status_code=403, detail="Not enough permissions")
+    
+    # Naive timestamps are wall-clock times in the schedule timezone
+    if ts is None:
+        ts = datetime.now(SCHEDULE_TIMEZONE).replace(tzinfo=None)
+    elif ts.tzinfo is not None:
+        ts = ts.astimezone(SCHEDULE_TIMEZONE).replace(tzinfo=None)
+    
+    index = await get_coverage_index()
+    user_ids = index.at(minute_of_week(ts), service)
+    employees = await db.users.find(
+        {"id": {"$in": user_ids}, "is_active": True},
+        {"_id": 0, "id": 1, "full_name": 1, "service": 1}
+    ).sort("full_name", ASCENDING).to_list(None) if user_ids else []
+    
+    return CoverageAt(
+        at=ts,
+        day=DAYS[ts.weekday()],
+        time=format_minutes(ts.hour * 60 + ts.minute),
+        count=len(employees),
+        employees=employees
+    )
+
+# Report Routes
+# Staffing coverage: schedules become an employees x 7 days x 96 slots boolean
+# matrix (working at the start of each 15 minute slot, breaks excluded) that
+# is summed per service. Counts are cached per schedules dataset version.
+SLOT_MINUTES = 15
+SLOTS_PER_DAY = MINUTES_PER_DAY // SLOT_MINUTES
+COVERAGE_CHUNK_SIZE = 10000
+
+def coverage_matrix(shifts: np.ndarray) -> np.ndarray:
+    # shifts is (n, 7, 4) float minutes with NaN for empty points. Slots are
+    # evaluated over two days so shifts past midnight spill into the next day.
+    start, break_start, break_end, end = (shifts[:, :, point] for point in range(len(SHIFT_POINTS)))
+    end = np.where(end < start, end + MINUTES_PER_DAY, end)
+    break_start = np.where(break_start < start, break_start + MINUTES_PER_DAY, break_start)
+    break_end = np.where(break_end < start, break_end + MINUTES_PER_DAY, break_end)
+    
+    # Breaks outside the shift are ignored, as in day_intervals
+    has_break = (start <= break_start) & (break_start < break_end) & (break_end <= end)
+    
+    slot_times = (np.arange(2 * SLOTS_PER_DAY) * SLOT_MINUTES)[None, None, :]
+    working = (slot_times >= start[..., None]) & (slot_times < end[..., None])
+    working &= ~(has_break[..., None] & (slot_times >= break_start[..., None]) & (slot_times < break_end[..., None]))
+    return working[:, :, :SLOTS_PER_DAY] | np.roll(working[:, :, SLOTS_PER_DAY:], 1, axis=1)
+
+def service_coverage_counts(shifts: np.ndarray, service_codes: np.ndarray, service_count: int) -> np.ndarray:
+    # Returns head-counts shaped (services, 7, SLOTS_PER_DAY)
+    counts = np.zeros((service_count, len(DAYS) * SLOTS_PER_DAY), dtype=np.float32)
+    for chunk_start in range(0, len(shifts), COVERAGE_CHUNK_SIZE):
+        chunk = slice(chunk_start, chunk_start + COVERAGE_CHUNK_SIZE)
+        covered = coverage_matrix(shifts[chunk]).reshape(-1, len(DAYS) * SLOTS_PER_DAY)
+        one_hot = np.zeros((service_count, covered.shape[0]), dtype=np.float32)
+        one_hot[service_codes[chunk], np.arange(covered.shape[0])] = 1
+        counts += one_hot @ covered.astype(np.float32)
+    return counts.round().astype(np.int32).reshape(service_count, len(DAYS), SLOTS_PER_DAY)
+
+def active_schedules_pipeline(projection: dict) -> list:
+    # Schedules of active users only, joined through the users.id index
+    return [
+        {"$lookup": {"from": "users", "localField": "user_id", "foreignField": "id", "as": "user"}},
+        {"$match": {"user.is_active": True}},
+        {"$project": {"_id": 0, **projection}},
+    ]
+
+async def load_shift_matrix(fields: Optional[dict] = None) -> tuple:
+    # Returns (shifts (n, 7, 4) float array, one dict of the projected fields per row)
+    fields = {"service": 1, **(fields or {})}
+    projection = {**fields, "shifts": 1, **{field: 1 for field in SCHEDULE_TIME_FIELDS}}
+    rows = []
+    shifts = []
+    async for schedule in db.schedules.aggregate(active_schedules_pipeline(projection), batchSize=EXPORT_BATCH_SIZE):
+        rows.append({field: schedule.get(field) for field in fields})
+        shifts.append(schedule.get("shifts") or legacy_shifts(schedule))
+    matrix = np.array(shifts, dtype=np.float64).reshape(len(shifts), len(DAYS), len(SHIFT_POINTS))
+    return matrix, rows
+
+coverage_report_cache: Dict[str, Any] = {}
+coverage_report_lock = asyncio.Lock()
+
+async def get_coverage_counts() -> dict:
+    dataset = await get_dataset_version(SCHEDULES_DATASET)
+    if coverage_report_cache.get("version") == dataset["version"]:
+        return coverage_report_cache
+    async with coverage_report_lock:
+        if coverage_report_cache.get("version") != dataset["version"]:
+            shifts, rows = await load_shift_matrix()
+            services = [row["service"] or "" for row in rows]
+            names, codes = np.unique(np.array(services, dtype=object), return_inverse=True)
+            counts = await run_cpu_bound(service_coverage_counts, shifts, codes.astype(np.int64), len(names))
+            coverage_report_cache.update({
+                "version": dataset["version"],
+                "services": [str(name) for name in names],
+                "employees": np.bincount(codes, minlength=len(names)).tolist(),
+                "counts": counts,
+            })
+    return coverage_report_cache
+
+class CoverageGap(BaseModel):
+    day: DayOfWeek
+    slot: str
+    count: int
+    required: int
+
+class ServiceCoverage(BaseModel):
+    service: str
+    employees: int
+    counts: Dict[DayOfWeek, List[int]]
+    gaps: List[CoverageGap] = []
+
+class CoverageReport(BaseModel):
+    version: int
+    slot_minutes: int = SLOT_MINUTES
+    services: List[ServiceCoverage]
+
+def opening_slots(open_from: int, open_to: int) -> np.ndarray:
+    # Slots of the day inside the opening window; windows ending earlier than
+    # they start run past midnight (22:00-06:00 covers 22:00-24:00 and 00:00-06:00)
+    slot_starts = np.arange(SLOTS_PER_DAY) * SLOT_MINUTES
+    slot_ends = slot_starts + SLOT_MINUTES
+    if open_from < open_to:
+        return (slot_ends > open_from) & (slot_starts < open_to)
+    return (slot_ends > open_from) | (slot_starts < open_to)
+
+@api_router.get("/reports/coverage", response_model=CoverageReport)
+async def get_coverage_report(
+    service: Optional[str] = None,
+    min_staff: Optional[int] = Query(None, ge=1),
+    open_from: str = "00:00",
+    open_to: str = "24:00",
+    current_user: User = Depends(get_current_active_user)
+):
+    if current_user.role not in [UserRole.ADMIN, UserRole.COORDINATOR]:
+        raise HTTPException(status_code=403, detail="Not enough permissions")
+    
+    try:
+        open_from_minutes, open_to_minutes = parse_time_minutes(open_from), parse_time_minutes(open_to)
+        open_slots = opening_slots(open_from_minutes, open_to_minutes)
+    except (TypeError, ValueError):
+        raise HTTPException(status_code=400, detail="open_from and open_to must be HH:MM")
+    if open_from_minutes == open_to_minutes:
+        raise HTTPException(status_code=400, detail="open_from and open_to must differ")
+    
+    coverage = await get_coverage_counts()
+    report = []
+    for index, name in enumerate(coverage["services"]):
+        if service is not None and name != service:
+            continue
+        counts = coverage["counts"][index]
+        gaps = []
+        if min_staff is not None:
+            # Only slots inside the opening window are checked against the threshold
+            for day_index, slot in np.argwhere(open_slots & (counts < min_staff)):
+                gaps.append(CoverageGap(
+                    day=DAYS[day_index],
+                    slot=format_minutes(int(slot) * SLOT_MINUTES),
+                    count=int(counts[day_index, slot]),
+                    required=min_staff
+                ))
+        report.append(ServiceCoverage(
+            service=name,
+            employees=coverage["employees"][index],
+            counts={day: counts[day_index].tolist() for day_index, day in enumerate(DAYS)},
+            gaps=gaps
+        ))
+    
+    return CoverageReport(version=coverage["version"], services=report)
+
+# Hours report: worked and break minutes per employee and day, computed over
+# the shift matrix and cached per schedules dataset version. Overtime against
+# the weekly threshold is derived per request.
+WEEKLY_HOURS_THRESHOLD = float(os.environ.get('WEEKLY_HOURS_THRESHOLD', 35))
+
+def shift_minutes(shifts: np.ndarray) -> tuple:
+    # Returns (worked, break) minutes shaped (n, 7), matching day_intervals
+    start, break_start, break_end, end = (shifts[:, :, point] for point in range(len(SHIFT_POINTS)))
+    end = np.where(end < start, end + MINUTES_PER_DAY, end)
+    break_start = np.where(break_start < start, break_start + MINUTES_PER_DAY, break_start)
+    break_end = np.where(break_end < start, break_end + MINUTES_PER_DAY, break_end)
+    
+    duration = np.nan_to_num(end - start)
+    has_break = (start <= break_start) & (break_start < break_end) & (break_end <= end)
+    breaks = np.where(has_break, break_end - break_start, 0)
+    return duration - breaks, breaks
+
+def hours_frame(shifts: np.ndarray, rows: list) -> pd.DataFrame:
+    worked, breaks = shift_minutes(shifts)
+    frame = pd.DataFrame(rows, columns=["user_id", "full_name", "service"])
+    frame["service"] = frame["service"].fillna("")
+    frame[DAYS] = worked.reshape(len(rows), len(DAYS))
+    frame["weekly_minutes"] = frame[DAYS].sum(axis=1)
+    frame["break_minutes"] = breaks.reshape(len(rows), len(DAYS)).sum(axis=1)
+    return frame.sort_values(["service", "full_name", "user_id"], ignore_index=True)
+
+hours_report_cache: Dict[str, Any] = {}
+hours_report_lock = asyncio.Lock()
+
+async def get_hours_frame() -> tuple:
+    dataset = await get_dataset_version(SCHEDULES_DATASET)
+    if hours_report_cache.get("version") != dataset["version"]:
+        async with hours_report_lock:
+            if hours_report_cache.get("version") != dataset["version"]:
+                shifts, rows = await load_shift_matrix({"user_id": 1, "full_name": "$user.full_name"})
+                for row in rows:
+                    row["full_name"] = (row["full_name"] or [""])[0]
+                frame = await run_cpu_bound(hours_frame, shifts, rows)
+                hours_report_cache.update({"version": dataset["version"], "frame": frame})
+    return hours_report_cache["version"], hours_report_cache["frame"]
+
+def minutes_to_hours(minutes) -> float:
+    return round(float(minutes) / 60, 2)
+
+class EmployeeHours(BaseModel):
+    user_id: str
+    full_name: str
+    service: str
+    weekly_hours: float
+    break_minutes: int
+    overtime_hours: float
+    daily_hours: Dict[DayOfWeek, float]
+
+class ServiceHours(BaseModel):
+    service: str
+    employees: int
+    weekly_hours: float
+    average_weekly_hours: float
+    break_minutes: int
+    overtime_employees: int
+    overtime_hours: float
+    daily_hours: Dict[DayOfWeek, float]
+
+class HoursReport(BaseModel):
+    version: int
+    overtime_threshold_hours: float
+    total_employees: int
+    services: List[ServiceHours]
+    employees: List[EmployeeHours]
+
+@api_router.get("/reports/hours", response_model=HoursReport)
+async def get_hours_report(
+    request: Request,
+    response: Response,
+    service: Optional[str] = None,
+    overtime_threshold: float = Query(WEEKLY_HOURS_THRESHOLD, ge=0),
+    offset: int = Query(0, ge=0),
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    current_user: User = Depends(get_current_active_user)
+):
+    if current_user.role not in [UserRole.ADMIN, UserRole.COORDINATOR]:
+        raise HTTPException(status_code=403, detail="Not enough permissions")
+    
+    version, frame = await get_hours_frame()
+    parameters = f"{service}|{overtime_threshold}|{offset}|{limit}"
+    etag = f'"hours-v{version}-{hashlib.sha256(parameters.encode()).hexdigest()[:16]}"'
+    if etag_matches(request, etag):
+        return Response(status_code=304, headers={"ETag": etag})
+    response.headers["ETag"] = etag
+    response.headers["Cache-Control"] = "private, no-cache"
+    
+    if service is not None:
+        frame = frame[frame["service"] == service]
+    overtime = (frame["weekly_minutes"] - overtime_threshold * 60).clip(lower=0)
+    
+    totals = frame.assign(overtime=overtime, overtime_employees=overtime > 0).groupby("service", sort=True).agg(
+        employees=("user_id", "size"),
+        weekly_minutes=("weekly_minutes", "sum"),
+        break_minutes=("break_minutes", "sum"),
+        overtime=("overtime", "sum"),
+        overtime_employees=("overtime_employees", "sum"),
+        **{day: (day, "sum") for day in DAYS}
+    )
+    services = [
+        ServiceHours(
+            service=name,
+            employees=int(row.employees),
+            weekly_hours=minutes_to_hours(row.weekly_minutes),
+            average_weekly_hours=minutes_to_hours(row.weekly_minutes / row.employees),
+            break_minutes=int(row.break_minutes),
+            overtime_employees=int(row.overtime_employees),
+            overtime_hours=minutes_to_hours(row.overtime),
+            daily_hours={day: minutes_to_hours(getattr(row, day)) for day in DAYS}
+        )
+        for name, row in zip(totals.index, totals.itertuples(index=False))
+    ]
+    
+    page = frame.iloc[offset:offset + limit]
+    employees = [
+        EmployeeHours(
+            user_id=row.user_id,
+            full_name=row.full_name,
+            service=row.service,
+            weekly_hours=minutes_to_hours(row.weekly_minutes),
+            break_minutes=int(row.break_minutes),
+            overtime_hours=minutes_to_hours(row.overtime),
+            daily_hours={day: minutes_to_hours(getattr(row, day)) for day in DAYS}
+        )
+        for row in page.assign(overtime=overtime.loc[page.index]).itertuples(index=False)
+    ]
+    
+    return HoursReport(
+        version=version,
+        overtime_threshold_hours=overtime_threshold,
+        total_employees=len(frame),
+        services=services,
+        employees=employees
+    )
+
+# Dashboard Routes
+# One round trip for the dashboard counters. The queries run concurrently and
+# the payload is cached briefly per role (per user for employees, whose
+# pending count only covers their own requests). Employees only get their
+# pending count; for admins and coordinators employees and employee_counts
+# cover active employees, on_shift_now counts active users working at the
+# current minute and scheduled_today those working at any time today, both in
+# SCHEDULE_TIMEZONE.
+DASHBOARD_CACHE_TTL_SECONDS = float(os.environ.get('DASHBOARD_CACHE_TTL_SECONDS', 10))
+dashboard_cache = TTLCache(1024, DASHBOARD_CACHE_TTL_SECONDS)
+
+class DashboardSummary(BaseModel):
+    role: UserRole
+    generated_at: datetime
+    pending_requests: int
+    employees: Optional[int] = None
+    employee_counts: Optional[Dict[str, int]] = None
+    on_shift_now: Optional[int] = None
+    scheduled_today: Optional[int] = None
+
+async def count_scheduled(start: int, end: int) -> int:
+    index = await get_coverage_index()
+    user_ids = index.between(start, end)
+    if not user_ids:
+        return 0
+    return await db.users.count_documents({"id": {"$in": user_ids}, "is_active": True})
+
+async def count_active_employees() -> Dict[str, int]:
+    pipeline = [
+        {"$match": {"role": UserRole.EMPLOYEE.value, "is_active": True}},
+        {"$group": {"_id": "$service", "count": {"$sum": 1}}},
+        {"$sort": {"_id": ASCENDING}},
+    ]
+    return {group["_id"]: group["count"] async for group in db.users.aggregate(pipeline)}
+
+@api_router.get("/dashboard/summary", response_model=DashboardSummary, response_model_exclude_none=True)
+async def get_dashboard_summary(current_user: User = Depends(get_current_active_user)):
+    cache_key = (current_user.role, current_user.id if current_user.role == UserRole.EMPLOYEE else None)
+    summary = dashboard_cache.get(cache_key)
+    if summary is not None:
+        return summary
+    
+    if current_user.role == UserRole.EMPLOYEE:
+        pending_requests = await db.schedule_requests.count_documents(
+            {"status": RequestStatus.PENDING.value, "employee_id": current_user.id}
+        )
+        summary = DashboardSummary(
+            role=current_user.role,
+            generated_at=datetime.utcnow(),
+            pending_requests=pending_requests
+        )
+        dashboard_cache.set(cache_key, summary)
+        return summary
+    
+    minute = minute_of_week(datetime.now(SCHEDULE_TIMEZONE).replace(tzinfo=None))
+    today = minute - minute % MINUTES_PER_DAY
+    
+    pending_requests, employee_counts, on_shift_now, scheduled_today = await asyncio.gather(
+        db.schedule_requests.count_documents({"status": RequestStatus.PENDING.value}),
+        count_active_employees(),
+        count_scheduled(minute, minute + 1),
+        count_scheduled(today, today + MINUTES_PER_DAY),
+    )
+    summary = DashboardSummary(
+        role=current_user.role,
+        generated_at=datetime.utcnow(),
+        pending_requests=pending_requests,
+        employees=sum(employee_counts.values()),
+        employee_counts=employee_counts,
+        on_shift_now=on_shift_now,
+        scheduled_today=scheduled_today
+    )
+    dashboard_cache.set(cache_key, summary)
+    return summary
+
+# Metrics Routes
+@api_router.get("/metrics/executors")
+async def get_executor_metrics(current_user: User = Depends(get_current_active_user)):
+    if current_user.role != UserRole.ADMIN:
+        raise HTTPException(status_code=403, detail="Not enough permissions")
+    return {"executors": executor_metrics()}
 
 # Initialize default admin user
 @api_router.post("/init-admin")
@@ -705,7 +2783,7 @@ async def init_admin():
         "username": "admin",
         "email": "admin@horarios.com",
         "full_name": "Administrador",
-        "password_hash": hash_password("admin123"),
+        "password_hash": await run_cpu_bound(hash_password, "admin123"),
         "role": UserRole.ADMIN,
         "service": "Administración",
         "is_active": True,
@@ -713,6 +2791,7 @@ async def init_admin():
     }
     
     await db.users.insert_one(admin_data)
+    await track_user_service(admin_data)
     return {"message": "Admin user created successfully", "username": "admin", "password": "admin123"}
 
 # Include the router in the main app
@@ -724,6 +2803,7 @@ app.add_middleware(
     allow_origins=["*"],
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=[NEXT_CURSOR_HEADER],
 )
 
 # Configure logging
@@ -733,6 +2813,94 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+# Indexes required by the queries above, keyed by collection
+REQUIRED_INDEXES = {
+    "users": [
+        IndexModel([("username", ASCENDING)], name="username_unique", unique=True),
+        IndexModel([("id", ASCENDING)], name="id_unique", unique=True),
+        IndexModel([("full_name", ASCENDING)], name="full_name"),
+        IndexModel(PAGINATION_SORT, name="created_at_id"),
+        IndexModel([("service", ASCENDING)] + PAGINATION_SORT, name="service_created_at_id"),
+        IndexModel([("role", ASCENDING)] + PAGINATION_SORT, name="role_created_at_id"),
+    ],
+    "schedules": [
+        IndexModel([("user_id", ASCENDING)], name="user_id_unique", unique=True),
+        IndexModel([("id", ASCENDING)], name="id_unique", unique=True),
+        IndexModel(PAGINATION_SORT, name="created_at_id"),
+        IndexModel([("service", ASCENDING)] + PAGINATION_SORT, name="service_created_at_id"),
+    ],
+    "schedule_requests": [
+        IndexModel([("id", ASCENDING)], name="id_unique", unique=True),
+        IndexModel([("employee_id", ASCENDING)] + PAGINATION_SORT, name="employee_id_created_at_id"),
+        IndexModel([("status", ASCENDING)] + PAGINATION_SORT, name="status_created_at_id"),
+        IndexModel(PAGINATION_SORT, name="created_at_id"),
+        IndexModel([("requested_date", ASCENDING)], name="requested_date"),
+    ],
+    "jobs": [
+        IndexModel([("id", ASCENDING)], name="id_unique", unique=True),
+        IndexModel([("created_by", ASCENDING), ("status", ASCENDING)], name="created_by_status"),
+        IndexModel([("status", ASCENDING), ("heartbeat_at", ASCENDING)], name="status_heartbeat_at"),
+    ],
+}
+
+async def ensure_indexes() -> bool:
+    ok = True
+    for collection_name, indexes in REQUIRED_INDEXES.items():
+        try:
+            await db[collection_name].create_indexes(indexes)
+        except OperationFailure as e:
+            # Typically duplicated data blocking a unique index; keep serving
+            logger.error(f"Could not create indexes on {collection_name}: {e}")
+            ok = False
+    return ok
+
+@app.on_event("startup")
+async def startup_db_client():
+    await ensure_indexes()
+    maintenance_tasks.add(asyncio.create_task(job_maintenance()))
+    if not await db.services.estimated_document_count():
+        await rebuild_service_catalog()
+    database_features["replica_set"] = await replica_set_available()
+    if database_features["replica_set"]:
+        request_events.change_stream_task = asyncio.create_task(watch_schedule_requests())
+
 @app.on_event("shutdown")
 async def shutdown_db_client():
+    if request_events.change_stream_task:
+        request_events.change_stream_task.cancel()
+    for task in maintenance_tasks:
+        task.cancel()
     client.close()
+    for executor in (thread_executor, process_executor):
+        if executor:
+            executor.shutdown()
+
+if __name__ == "__main__":
+    import typer
+
+    cli = typer.Typer(help="Maintenance commands for the schedules backend")
+
+    @cli.callback()
+    def main():
+        pass
+
+    @cli.command("ensure-indexes")
+    def ensure_indexes_command():
+        if not asyncio.run(ensure_indexes()):
+            raise typer.Exit(code=1)
+        typer.echo("Indexes are up to date")
+
+    @cli.command("migrate-schedules")
+    def migrate_schedules_command(batch_size: int = 1000):
+        migrated, skipped = asyncio.run(migrate_schedule_documents(batch_size))
+        typer.echo(f"Migrated {migrated} schedules")
+        if skipped:
+            typer.echo(f"Skipped {len(skipped)} schedules with unreadable times: {', '.join(skipped)}")
+            raise typer.Exit(code=1)
+
+    @cli.command("rebuild-services")
+    def rebuild_services_command():
+        asyncio.run(rebuild_service_catalog())
+        typer.echo("Service catalog rebuilt")
+
+    cli()
@@ -0,0 +1,18 @@
+import sys
+from pathlib import Path
+
+import pytest
+from mongomock_motor import AsyncMongoMockClient
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "backend"))
+
+import server  # noqa: E402
+
+
+@pytest.fixture
+def db(monkeypatch):
+    database = AsyncMongoMockClient()["test"]
+    monkeypatch.setattr(server, "db", database)
+    server.dataset_version_cache.clear()
+    yield database
+    server.dataset_version_cache.clear()
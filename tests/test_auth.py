@@ -0,0 +1,93 @@
+import asyncio
+
+import pytest
+
+import server
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(server.time, "monotonic", clock)
+    return clock
+
+
+def test_ttl_cache_expires_entries(clock):
+    cache = server.TTLCache(10, 60)
+    cache.set("a", 1)
+    clock.now += 59
+    assert cache.get("a") == 1
+    clock.now += 2
+    assert cache.get("a") is None
+    assert cache.get("a", "default") == "default"
+
+
+def test_ttl_cache_evicts_least_recently_used(clock):
+    cache = server.TTLCache(2, 60)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    cache.get("a")
+    cache.set("c", 3)
+    assert (cache.get("a"), cache.get("b"), cache.get("c")) == (1, None, 3)
+    cache.pop("a")
+    cache.pop("missing")
+    assert cache.get("a") is None
+
+
+@pytest.fixture
+def principals(db, monkeypatch):
+    monkeypatch.setattr(server, "principal_cache", server.TTLCache(100, 60))
+    asyncio.run(db.users.insert_one({
+        "id": "u1", "username": "ana", "email": "ana@x", "full_name": "Ana",
+        "role": "coordinator", "service": "A", "is_active": True,
+    }))
+    return server.create_access_token({"sub": "ana"})
+
+
+def test_principal_is_served_from_cache(db, principals):
+    async def run():
+        first = await server.user_from_token(principals)
+        await db.users.update_one({"username": "ana"}, {"$set": {"role": "employee"}})
+        return first, await server.user_from_token(principals)
+
+    first, second = asyncio.run(run())
+    assert first.role == second.role == server.UserRole.COORDINATOR
+
+
+def test_principal_invalidation_reaches_other_workers(db, principals):
+    async def run():
+        await server.user_from_token(principals)
+        # Another worker changes the user and bumps the shared version; this
+        # worker only sees the bump once its dataset version cache expires
+        await db.users.update_one({"username": "ana"}, {"$set": {"role": "employee"}})
+        await db.dataset_versions.update_one(
+            {"_id": server.PRINCIPALS_DATASET},
+            {"$inc": {"version": 1}, "$set": {"updated_at": server.datetime.utcnow()}},
+            upsert=True
+        )
+        server.dataset_version_cache.clear()
+        return await server.user_from_token(principals)
+
+    assert asyncio.run(run()).role == server.UserRole.EMPLOYEE
+
+
+def test_invalidate_principal_drops_local_entry_and_bumps_version(db, principals):
+    async def run():
+        await server.user_from_token(principals)
+        before = await server.get_dataset_version(server.PRINCIPALS_DATASET)
+        await db.users.update_one({"username": "ana"}, {"$set": {"is_active": False}})
+        await server.invalidate_principal("ana", None)
+        after = await server.get_dataset_version(server.PRINCIPALS_DATASET)
+        return before["version"], after["version"], await server.user_from_token(principals)
+
+    before, after, user = asyncio.run(run())
+    assert after == before + 1
+    assert user.is_active is False
@@ -0,0 +1,77 @@
+import asyncio
+
+import pytest
+from fastapi import HTTPException
+
+import server
+
+
+@pytest.fixture
+def coordinator(monkeypatch):
+    monkeypatch.setattr(server, "coverage_index", server.CoverageIndex())
+    monkeypatch.setattr(server, "request_events", server.EventBus(100))
+    return server.User(id="c1", username="coord", email="c@x", full_name="Coord", role="coordinator", service="A")
+
+
+def week():
+    return [[None, None, None, None] for _ in server.DAYS]
+
+
+def test_schedule_batch_reports_each_item(db, coordinator):
+    updates = [
+        server.ScheduleBatchUpdate(id="s1", monday_start="7:30", monday_end=None),
+        server.ScheduleBatchUpdate(id="s2"),
+        server.ScheduleBatchUpdate(id="missing", service="B"),
+        server.ScheduleBatchUpdate(id="legacy", tuesday_start="08:00"),
+    ]
+
+    async def run():
+        await db.schedules.insert_many([
+            {"id": "s1", "user_id": "u1", "service": "A", "shifts": week()},
+            {"id": "s2", "user_id": "u2", "service": "A", "shifts": week()},
+            {"id": "legacy", "user_id": "u3", "service": "A", "tuesday_start": "09:00"},
+        ])
+        result = await server.update_schedules_batch(updates, current_user=coordinator)
+        documents = {document["id"]: document async for document in db.schedules.find({}, {"_id": 0})}
+        return result, documents
+
+    result, documents = asyncio.run(run())
+    assert result.updated == 1
+    assert [(item.id, item.status_code) for item in result.results] == [
+        ("s1", 200), ("s2", 400), ("missing", 404), ("legacy", 409)
+    ]
+    assert documents["s1"]["shifts"][0] == [450, None, None, None]
+    assert documents["legacy"]["tuesday_start"] == "09:00"
+    assert server.coverage_index.entries.keys() == {"s1"}
+
+
+def test_request_batch_reports_each_item(db, coordinator):
+    responses = [
+        server.ScheduleRequestResponse(request_id=request_id, status="approved", response="OK")
+        for request_id in ["r1", "r2", "missing"]
+    ]
+
+    async def run():
+        await db.schedule_requests.insert_many([
+            {"id": "r1", "employee_id": "e1", "status": "pending"},
+            {"id": "r2", "employee_id": "e1", "status": "rejected", "processed_by": "other"},
+        ])
+        result = await server.respond_to_requests_batch(responses, current_user=coordinator)
+        return result, await db.schedule_requests.find_one({"id": "r1"})
+
+    result, request = asyncio.run(run())
+    assert result.updated == 1
+    assert [(item.id, item.status_code) for item in result.results] == [("r1", 200), ("r2", 409), ("missing", 404)]
+    assert request["status"] == "approved" and request["processed_by"] == "c1"
+
+
+@pytest.mark.parametrize("ids, detail", [
+    (["r1", "r2", "r1"], "Duplicate ids in batch: r1"),
+    ([f"r{number}" for number in range(server.MAX_BATCH_SIZE + 1)], f"Batches are limited to {server.MAX_BATCH_SIZE} items"),
+])
+def test_request_batch_rejects_invalid_batches(db, coordinator, ids, detail):
+    responses = [server.ScheduleRequestResponse(request_id=request_id, status="approved", response="OK") for request_id in ids]
+    with pytest.raises(HTTPException) as error:
+        asyncio.run(server.respond_to_requests_batch(responses, current_user=coordinator))
+    assert error.value.status_code == 400
+    assert error.value.detail == detail
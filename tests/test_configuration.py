@@ -0,0 +1,24 @@
+import asyncio
+
+import server
+
+
+def test_concurrent_reads_create_a_single_configuration(db, monkeypatch):
+    monkeypatch.setattr(server, "configuration_cache", {})
+
+    async def read_concurrently():
+        await asyncio.gather(*(server.get_cached_configuration() for _ in range(5)))
+        return await db.configurations.find().to_list(None)
+
+    documents = asyncio.run(read_concurrently())
+    assert [document["_id"] for document in documents] == [server.CONFIGURATION_ID]
+
+
+def test_configuration_is_seeded_from_legacy_document(db, monkeypatch):
+    monkeypatch.setattr(server, "configuration_cache", {})
+
+    async def read_legacy():
+        await db.configurations.insert_one(server.Configuration(background_color="#000000").dict())
+        return await server.get_cached_configuration()
+
+    assert asyncio.run(read_legacy())["config"].background_color == "#000000"
@@ -0,0 +1,80 @@
+import random
+
+import pytest
+
+import server
+
+
+def random_document(rng, schedule_id, user_id):
+    shifts = []
+    for _ in server.DAYS:
+        if rng.random() < 0.3:
+            shifts.append([None, None, None, None])
+            continue
+        start = rng.randrange(0, server.MINUTES_PER_DAY, 15)
+        end = (start + rng.randrange(60, 12 * 60, 15)) % server.MINUTES_PER_DAY
+        break_start = (start + 120) % server.MINUTES_PER_DAY
+        shifts.append([start, break_start, (break_start + 30) % server.MINUTES_PER_DAY, end])
+    return {"id": schedule_id, "user_id": user_id, "service": rng.choice(["A", "B", "C"]), "shifts": shifts}
+
+
+def test_incremental_updates_match_full_rebuild():
+    rng = random.Random(7)
+    index = server.CoverageIndex()
+    for number in range(200):
+        index.upsert(random_document(rng, f"s{number}", f"u{number}"))
+    index.arrays()
+
+    for _ in range(300):
+        number = rng.randrange(250)
+        action = rng.random()
+        if action < 0.6:
+            index.upsert(random_document(rng, f"s{number}", f"u{number}"))
+        elif action < 0.8:
+            index.remove(f"s{number}")
+        else:
+            index.remove_user(f"u{number}")
+
+    rebuilt = server.CoverageIndex()
+    rebuilt.entries = dict(index.entries)
+    for minute in range(0, server.MINUTES_PER_WEEK, 7):
+        for service in (None, "A", "C", "missing"):
+            assert sorted(index.at(minute, service)) == sorted(rebuilt.at(minute, service))
+
+
+def test_removed_owners_are_counted_for_compaction():
+    index = server.CoverageIndex()
+    document = {"id": "s1", "user_id": "u1", "service": "A", "shifts": [[480, None, None, 960]] + [[None] * 4] * 6}
+    index.upsert(document)
+    index.arrays()
+    index.upsert(document)
+    assert index.arrays()["dead_owners"] == 1
+    assert index.at(600) == ["u1"]
+    index.remove("s1")
+    assert index.at(600) == []
+
+
+def test_between_returns_users_working_in_the_range():
+    index = server.CoverageIndex()
+    empty = [[None, None, None, None]] * 6
+    index.upsert({"id": "s1", "user_id": "day", "service": "A", "shifts": [[480, 720, 780, 1020]] + empty})
+    index.upsert({"id": "s2", "user_id": "night", "service": "B", "shifts": empty + [[1320, None, None, 360]]})
+    assert index.between(0, server.MINUTES_PER_DAY) == ["day", "night"]
+    assert index.between(360, 480) == []
+    assert index.between(720, 780) == []
+    assert index.between(1019, 1020, "A") == ["day"]
+    assert index.at(server.MINUTES_PER_WEEK - 1) == ["night"]
+
+
+@pytest.mark.parametrize("day_index, points, intervals", [
+    (0, [480, 720, 780, 1020], [(480, 720), (780, 1020)]),
+    (0, [480, 1080, 1140, 1020], [(480, 1020)]),
+    (1, [1320, None, None, 360], [(2760, 3240)]),
+    (0, [1320, 60, 90, 360], [(1320, 1500), (1530, 1800)]),
+    (6, [1320, None, None, 360], [(0, 360), (9960, 10080)]),
+    (6, [1380, 270, 300, 330], [(0, 270), (10020, 10080), (300, 330)]),
+    (0, [480, None, None, 480], []),
+    (0, [480, None, None, None], []),
+])
+def test_day_intervals(day_index, points, intervals):
+    assert server.day_intervals(day_index, points) == intervals
@@ -0,0 +1,55 @@
+import asyncio
+from datetime import date, datetime, timedelta
+
+import pytest
+from fastapi import HTTPException, Response
+
+import server
+
+
+def test_cursor_selects_documents_after_the_last_one():
+    created_at = datetime(2026, 10, 17, 8, 30, 15, 123000)
+    query = server.decode_cursor(server.encode_cursor({"id": "b|c", "created_at": created_at}))
+    assert query == {"$or": [
+        {"created_at": {"$gt": created_at}},
+        {"created_at": created_at, "id": {"$gt": "b|c"}},
+    ]}
+
+
+@pytest.mark.parametrize("cursor", ["not-base64!", "bm8tc2VwYXJhdG9y", "bm90LWEtZGF0ZXxpZA=="])
+def test_decode_cursor_rejects_invalid_cursors(cursor):
+    with pytest.raises(HTTPException) as error:
+        server.decode_cursor(cursor)
+    assert error.value.status_code == 400
+
+
+def test_fetch_page_walks_every_document_once(db):
+    start = datetime(2026, 1, 1)
+    # Pairs of documents share a created_at, so pages must break ties on id
+    documents = [
+        {"id": f"u{number:02d}", "created_at": start + timedelta(seconds=number // 2)}
+        for number in reversed(range(25))
+    ]
+
+    async def walk():
+        await db.users.insert_many(documents)
+        seen = []
+        after = None
+        while True:
+            response = Response()
+            page = await server.fetch_page(db.users, {}, 10, after, response, {"_id": 0, "id": 1, "created_at": 1})
+            seen.append([document["id"] for document in page])
+            after = response.headers.get(server.NEXT_CURSOR_HEADER)
+            if after is None:
+                return seen
+
+    pages = asyncio.run(walk())
+    assert [len(page) for page in pages] == [10, 10, 5]
+    assert sum(pages, []) == [f"u{number:02d}" for number in range(25)]
+
+
+def test_requested_date_filter_uses_iso_dates():
+    assert server.requested_date_filter(date(2026, 1, 5), date(2026, 2, 1)) == {
+        "requested_date": {"$gte": "2026-01-05", "$lte": "2026-02-01"}
+    }
+    assert server.requested_date_filter(None, None) == {}
@@ -0,0 +1,44 @@
+import asyncio
+
+import server
+
+
+def user(user_id, role, service="A", is_active=True):
+    return {
+        "id": user_id,
+        "username": user_id,
+        "email": f"{user_id}@x",
+        "full_name": user_id,
+        "role": role,
+        "service": service,
+        "is_active": is_active,
+    }
+
+
+def test_dashboard_summary_is_shaped_by_role(db, monkeypatch):
+    monkeypatch.setattr(server, "dashboard_cache", server.TTLCache(16, 60))
+    monkeypatch.setattr(server, "coverage_index", server.CoverageIndex())
+
+    async def summaries():
+        await db.users.insert_many([
+            user("admin", "admin"),
+            user("e1", "employee"),
+            user("e2", "employee", service="B"),
+            user("gone", "employee", is_active=False),
+        ])
+        await db.schedule_requests.insert_many([
+            {"id": "r1", "employee_id": "e1", "status": "pending"},
+            {"id": "r2", "employee_id": "e2", "status": "pending"},
+            {"id": "r3", "employee_id": "e1", "status": "approved"},
+        ])
+        admin = server.User(**user("admin", "admin"))
+        employee = server.User(**user("e1", "employee"))
+        return await server.get_dashboard_summary(admin), await server.get_dashboard_summary(employee)
+
+    admin_summary, employee_summary = asyncio.run(summaries())
+    assert admin_summary.pending_requests == 2
+    assert admin_summary.employees == 2
+    assert admin_summary.employee_counts == {"A": 1, "B": 1}
+    assert admin_summary.on_shift_now == 0 and admin_summary.scheduled_today == 0
+    assert employee_summary.dict(exclude_none=True).keys() == {"role", "generated_at", "pending_requests"}
+    assert employee_summary.pending_requests == 1
@@ -0,0 +1,41 @@
+import asyncio
+
+import server
+
+
+class ConnectedRequest:
+    async def is_disconnected(self):
+        return False
+
+
+def schedule_request(number):
+    return {
+        "id": f"r{number}",
+        "employee_id": "e1",
+        "requested_date": "2026-10-20",
+        "request_type": "day_off",
+        "reason": "Médico",
+    }
+
+
+def test_stream_resubscribes_after_falling_behind(monkeypatch):
+    bus = server.EventBus(2)
+    monkeypatch.setattr(server, "request_events", bus)
+    admin = server.User(username="admin", email="admin@x", full_name="Admin", role="admin", service="A")
+
+    async def read_stream():
+        response = await server.stream_schedule_request_events(ConnectedRequest(), current_user=admin)
+        events = response.body_iterator
+        for number in range(3):
+            bus.publish({"type": "created", "request": schedule_request(number)})
+        received = [await events.__anext__(), await events.__anext__()]
+        bus.publish({"type": "updated", "request": schedule_request(3)})
+        received.append(await events.__anext__())
+        await events.aclose()
+        return received
+
+    received = asyncio.run(read_stream())
+    assert received[0].startswith("event: created\n") and '"id":"r1"' in received[0]
+    assert received[1] == "event: resync\ndata: {}\n\n"
+    assert received[2].startswith("event: updated\n") and '"id":"r3"' in received[2]
+    assert bus.subscribers == set()
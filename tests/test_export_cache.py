@@ -0,0 +1,27 @@
+import asyncio
+
+import server
+
+
+def test_get_cached_export_reuses_files_rendered_by_other_workers(db, tmp_path, monkeypatch):
+    rendered = []
+
+    async def write_export(path):
+        rendered.append(path)
+        path.write_text("Nombre\n")
+
+    monkeypatch.setattr(server, "EXPORT_CACHE_DIR", tmp_path)
+    monkeypatch.setattr(server, "export_cache", {})
+    monkeypatch.setitem(server.EXPORT_WRITERS, server.ExportFormat.CSV, write_export)
+
+    async def export_twice():
+        first = await server.get_cached_export(server.ExportFormat.CSV)
+        # A restarted or different worker starts with an empty in-process cache
+        server.export_cache.clear()
+        second = await server.get_cached_export(server.ExportFormat.CSV)
+        return first, second
+
+    first, second = asyncio.run(export_twice())
+    assert len(rendered) == 1
+    assert first["path"] == second["path"] == tmp_path / "horarios-v0.csv"
+    assert first["etag"] == second["etag"]
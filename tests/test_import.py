@@ -0,0 +1,65 @@
+import asyncio
+
+import numpy as np
+import pandas as pd
+import pytest
+from openpyxl import Workbook
+
+import server
+
+
+def import_frame(**columns):
+    row = {"Nombre": "Juan Pérez", "Servicio": "Administración", **columns}
+    return pd.DataFrame([row])
+
+
+def test_normalize_import_frame_parses_rows():
+    rows = server.normalize_import_frame(import_frame(**{
+        "Lunes INICIO JORNADA": "08:00",
+        "Lunes FIN JORNADA": "17:00",
+    }))
+    assert rows["full_name"].tolist() == ["Juan Pérez"]
+    assert rows["service"].tolist() == ["Administración"]
+    assert rows["shifts"].iloc[0][0] == [480, None, None, 1020]
+
+
+def test_normalize_import_frame_skips_rows_without_name():
+    df = pd.DataFrame([
+        {"Nombre": "Juan Pérez", "Servicio": "Administración"},
+        {"Nombre": np.nan, "Servicio": "Administración"},
+        {"Nombre": "  ", "Servicio": "Administración"},
+    ])
+    assert server.normalize_import_frame(df)["full_name"].tolist() == ["Juan Pérez"]
+
+
+@pytest.mark.parametrize("service", [np.nan, None, "", "  "])
+def test_normalize_import_frame_rejects_missing_service(service):
+    with pytest.raises(ValueError, match="Servicio"):
+        server.normalize_import_frame(import_frame(Servicio=service))
+
+
+def test_normalize_import_frame_rejects_missing_service_column():
+    with pytest.raises(ValueError, match="Servicio"):
+        server.normalize_import_frame(pd.DataFrame([{"Nombre": "Juan Pérez"}]))
+
+
+def test_import_schedule_file_validates_every_row_before_writing(tmp_path, monkeypatch):
+    wb = Workbook()
+    ws = wb.active
+    ws.append(server.TEMPLATE_HEADERS)
+    for number in range(1500):
+        ws.append([f"Empleado {number}", "Administración", None, None, "08:00", None, None, "17:00"])
+    ws.cell(row=1201, column=5).value = "25:00"
+    path = tmp_path / "horarios.xlsx"
+    wb.save(path)
+
+    written = []
+
+    async def import_schedule_frame(frame):
+        written.append(len(frame))
+        return len(frame), 0
+
+    monkeypatch.setattr(server, "import_schedule_frame", import_schedule_frame)
+    with pytest.raises(ValueError, match="Invalid time '25:00' .*, row 1201"):
+        asyncio.run(server.import_schedule_file(path))
+    assert written == []
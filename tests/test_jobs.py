@@ -0,0 +1,62 @@
+import asyncio
+from datetime import datetime, timedelta
+
+import pytest
+from fastapi import HTTPException
+
+import server
+
+
+@pytest.fixture
+def user(monkeypatch):
+    monkeypatch.setattr(server, "JOB_MAX_ACTIVE_PER_USER", 2)
+    return server.User(id="u1", username="ana", email="ana@x", full_name="Ana", role="coordinator", service="A")
+
+
+def job(job_id, created_by="u1", status="running", created_at=None):
+    return {"id": job_id, "created_by": created_by, "status": status, "created_at": created_at or datetime(2026, 1, 1)}
+
+
+def test_reserve_job_limits_active_jobs_per_user(db, user):
+    async def run():
+        await db.jobs.insert_many([
+            job("old", status="completed"),
+            job("other", created_by="u2"),
+            job("active"),
+        ])
+        reserved = await server.reserve_job(server.JobType.EXPORT_SCHEDULES, user)
+        with pytest.raises(HTTPException) as error:
+            await server.reserve_job(server.JobType.EXPORT_SCHEDULES, user)
+        return reserved, error.value, await db.jobs.distinct("id", {"created_by": "u1"})
+
+    reserved, error, job_ids = asyncio.run(run())
+    assert error.status_code == 429
+    assert sorted(job_ids) == sorted(["old", "active", reserved.id])
+
+
+def test_reserve_job_ranks_only_earlier_jobs(db, user, monkeypatch):
+    now = datetime(2026, 1, 2, 8, 0, 0, 123000)
+
+    class FrozenDatetime(datetime):
+        @classmethod
+        def utcnow(cls):
+            return now
+
+    monkeypatch.setattr(server, "datetime", FrozenDatetime)
+
+    # Jobs inserted after this one by concurrent submissions must not push it
+    # over the limit; equal timestamps are ordered by id
+    async def run():
+        await db.jobs.insert_many([
+            job("active"),
+            job("later", created_at=now + timedelta(minutes=1)),
+            job("~tied-later", created_at=now),
+        ])
+        reserved = await server.reserve_job(server.JobType.IMPORT_SCHEDULES, user)
+        await db.jobs.insert_one(job("!tied-earlier", created_at=now))
+        with pytest.raises(HTTPException):
+            await server.reserve_job(server.JobType.IMPORT_SCHEDULES, user)
+        return reserved
+
+    reserved = asyncio.run(run())
+    assert reserved.status == server.JobStatus.QUEUED
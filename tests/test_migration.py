@@ -0,0 +1,23 @@
+import asyncio
+
+import server
+
+
+def test_migrate_schedule_documents_skips_unreadable_times(db):
+    async def migrate():
+        await db.schedules.insert_many([
+            {"id": "s1", "user_id": "u1", "service": "A", "monday_start": "08:00", "monday_end": "17:00", "sunday_end": ""},
+            {"id": "s2", "user_id": "u2", "service": "A", "monday_start": "8h", "monday_end": "17:00"},
+            {"id": "s3", "user_id": "u3", "service": "A", "tuesday_start": "8:00 AM"},
+        ])
+        result = await server.migrate_schedule_documents(batch_size=1)
+        documents = {document["id"]: document async for document in db.schedules.find({}, {"_id": 0})}
+        return result, documents
+
+    (migrated, skipped), documents = asyncio.run(migrate())
+    assert migrated == 1
+    assert skipped == ["s2", "s3"]
+    assert documents["s1"]["shifts"][0] == [480, None, None, 1020]
+    assert "monday_start" not in documents["s1"]
+    assert documents["s2"]["monday_start"] == "8h" and "shifts" not in documents["s2"]
+    assert documents["s3"]["tuesday_start"] == "8:00 AM"
@@ -0,0 +1,118 @@
+import random
+
+import numpy as np
+
+import server
+
+
+def shift_array(*schedules):
+    shifts = np.full((len(schedules), len(server.DAYS), len(server.SHIFT_POINTS)), np.nan)
+    for row, schedule in enumerate(schedules):
+        for day_index, points in enumerate(schedule):
+            shifts[row, day_index] = [np.nan if minutes is None else minutes for minutes in points]
+    return shifts
+
+
+def empty_week():
+    return [[None, None, None, None] for _ in server.DAYS]
+
+
+def random_week(rng):
+    week = empty_week()
+    for day_index in range(len(server.DAYS)):
+        if rng.random() < 0.3:
+            continue
+        start = rng.randrange(0, server.MINUTES_PER_DAY, 15)
+        end = (start + rng.randrange(60, 12 * 60, 15)) % server.MINUTES_PER_DAY
+        break_start = (start + rng.randrange(0, 6 * 60, 15)) % server.MINUTES_PER_DAY
+        break_end = (break_start + rng.choice([0, 30, 60])) % server.MINUTES_PER_DAY
+        week[day_index] = [start, break_start, break_end, end]
+    return week
+
+
+def slots(*minutes):
+    return [minute // server.SLOT_MINUTES for minute in minutes]
+
+
+def test_opening_slots_daytime_window():
+    window = server.opening_slots(480, 1200)
+    assert np.flatnonzero(window).tolist() == list(range(*slots(480, 1200)))
+    assert server.opening_slots(0, server.MINUTES_PER_DAY).all()
+
+
+def test_opening_slots_include_partially_open_slots():
+    window = server.opening_slots(490, 1190)
+    assert np.flatnonzero(window).tolist() == list(range(*slots(480, 1200)))
+
+
+def test_opening_slots_wrap_past_midnight():
+    window = server.opening_slots(1320, 360)
+    assert np.flatnonzero(window).tolist() == list(range(*slots(0, 360))) + list(range(*slots(1320, 1440)))
+
+
+def test_coverage_matrix_wraps_sunday_night_into_monday():
+    week = empty_week()
+    week[0] = [480, 720, 780, 1020]
+    week[6] = [1320, None, None, 360]
+    matrix = server.coverage_matrix(shift_array(week))
+    slot = lambda minutes: minutes // server.SLOT_MINUTES
+    monday, sunday = matrix[0, 0], matrix[0, 6]
+    assert monday[slot(0):slot(360)].all() and not monday[slot(360):slot(480)].any()
+    assert monday[slot(480):slot(720)].all() and not monday[slot(720):slot(780)].any()
+    assert monday[slot(780):slot(1020)].all() and not monday[slot(1020):].any()
+    assert sunday[slot(1320):].all() and not sunday[:slot(1320)].any()
+
+
+def test_coverage_matrix_ignores_breaks_outside_the_shift():
+    week = empty_week()
+    week[0] = [45, 330, 390, 360]
+    monday = server.coverage_matrix(shift_array(week))[0, 0]
+    assert monday[45 // server.SLOT_MINUTES:360 // server.SLOT_MINUTES].all()
+
+
+def test_coverage_matrix_matches_day_intervals():
+    rng = random.Random(3)
+    weeks = [random_week(rng) for _ in range(50)]
+    matrix = server.coverage_matrix(shift_array(*weeks))
+    slot_times = np.arange(len(server.DAYS) * server.SLOTS_PER_DAY) * server.SLOT_MINUTES
+    for row, week in enumerate(weeks):
+        expected = np.zeros(slot_times.shape, dtype=bool)
+        for start, end in server.shift_intervals(week):
+            expected |= (slot_times >= start) & (slot_times < end)
+        assert (matrix[row].ravel() == expected).all()
+
+
+def test_shift_minutes():
+    week = empty_week()
+    week[0] = [480, 720, 780, 1020]
+    week[2] = [480, 1080, 1140, 1020]
+    week[6] = [1320, 60, 90, 360]
+    worked, breaks = server.shift_minutes(shift_array(week))
+    assert worked[0].tolist() == [480, 0, 540, 0, 0, 0, 450]
+    assert breaks[0].tolist() == [60, 0, 0, 0, 0, 0, 30]
+
+
+def test_shift_minutes_match_day_intervals():
+    rng = random.Random(5)
+    weeks = [random_week(rng) for _ in range(50)]
+    worked, _ = server.shift_minutes(shift_array(*weeks))
+    for row, week in enumerate(weeks):
+        for day_index, points in enumerate(week):
+            intervals = server.day_intervals(day_index, points)
+            assert worked[row, day_index] == sum(end - start for start, end in intervals)
+
+
+def test_hours_frame_totals_per_employee():
+    day, night = empty_week(), empty_week()
+    day[0] = [480, 720, 780, 1020]
+    night[6] = [1320, None, None, 360]
+    rows = [
+        {"user_id": "u2", "full_name": "Noche", "service": "B"},
+        {"user_id": "u1", "full_name": "Día", "service": None},
+    ]
+    frame = server.hours_frame(shift_array(night, day), rows)
+    assert frame["user_id"].tolist() == ["u1", "u2"]
+    assert frame["service"].tolist() == ["", "B"]
+    assert frame["weekly_minutes"].tolist() == [480, 480]
+    assert frame["break_minutes"].tolist() == [60, 0]
+    assert frame["sunday"].tolist() == [0, 480]
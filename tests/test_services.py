@@ -0,0 +1,20 @@
+import asyncio
+
+import server
+
+
+def current_user(role):
+    return server.User(username=role, email=f"{role}@x", full_name=role, role=role, service="A")
+
+
+def test_services_hide_employee_counts_from_employees(db):
+    async def list_services():
+        await db.services.insert_many([{"_id": "B", "employee_count": 2}, {"_id": "A", "employee_count": 1}])
+        return (
+            await server.get_services(current_user("coordinator")),
+            await server.get_services(current_user("employee")),
+        )
+
+    coordinator_view, employee_view = asyncio.run(list_services())
+    assert coordinator_view == {"services": ["A", "B"], "employee_counts": {"A": 1, "B": 2}}
+    assert employee_view == {"services": ["A", "B"]}
@@ -0,0 +1,32 @@
+import server
+
+
+def test_schedule_document_round_trips_through_view():
+    schedule = server.Schedule(
+        user_id="u1",
+        service="Urgencias",
+        monday_start="8:00",
+        monday_break_start="12:00",
+        monday_break_end="12:30",
+        monday_end="17:00",
+        sunday_start="22:00",
+        sunday_end="06:00",
+    )
+    document = server.schedule_document(schedule)
+    assert document["shifts"][0] == [480, 720, 750, 1020]
+    assert document["shifts"][6] == [1320, None, None, 360]
+    assert not any(field in document for field in server.SCHEDULE_TIME_FIELDS)
+    assert server.schedule_view(document) == schedule.dict()
+    assert server.schedule_from_document(document) == schedule
+
+
+def test_legacy_documents_read_like_shifts():
+    schedule = server.Schedule(user_id="u1", service="Urgencias", tuesday_start="07:00", tuesday_end="24:00")
+    legacy = schedule.dict()
+    assert server.legacy_shifts(legacy) == server.schedule_document(schedule)["shifts"]
+    assert server.schedule_view(legacy) == schedule.dict()
+
+
+def test_legacy_shifts_drop_unreadable_values():
+    shifts = server.legacy_shifts({"monday_start": "8h", "monday_end": "17:00"})
+    assert shifts[0] == [None, None, None, 1020]
@@ -0,0 +1,88 @@
+import asyncio
+
+import pytest
+from fastapi import HTTPException
+
+import server
+
+
+def week(**days):
+    return [days.get(day, [None, None, None, None]) for day in server.DAYS]
+
+
+def test_schedule_fields_filters_time_fields_by_day():
+    assert server.schedule_fields(None, None) is None
+    assert server.schedule_fields("service, monday_start,service", None) == ["service", "monday_start"]
+    assert server.schedule_fields("service,monday_start,tuesday_end", server.DayOfWeek("tuesday")) == [
+        "service", "tuesday_end"
+    ]
+    selected = server.schedule_fields(None, server.DayOfWeek("sunday"))
+    assert [field for field in selected if field in server.SCHEDULE_TIME_POSITIONS] == [
+        "sunday_start", "sunday_break_start", "sunday_break_end", "sunday_end"
+    ]
+    assert "user_id" in selected and "monday_start" not in selected
+
+
+@pytest.mark.parametrize("fields, day, detail", [
+    ("password_hash", None, "Unknown fields: password_hash"),
+    (" , ", None, "No fields selected"),
+    ("monday_start", "tuesday", "No fields selected"),
+])
+def test_schedule_fields_rejects_empty_or_unknown_selections(fields, day, detail):
+    with pytest.raises(HTTPException) as error:
+        server.schedule_fields(fields, day and server.DayOfWeek(day))
+    assert error.value.status_code == 400
+    assert error.value.detail == detail
+
+
+def test_schedule_sparse_projection_slices_a_single_day():
+    projection, day_offset = server.schedule_sparse_projection(["service", "wednesday_start", "wednesday_end"])
+    assert projection["shifts"] == {"$slice": [2, 1]}
+    assert projection["wednesday_start"] == projection["service"] == 1
+    assert day_offset == 2
+
+
+def test_schedule_sparse_projection_without_time_fields_skips_shifts():
+    projection, day_offset = server.schedule_sparse_projection(["service"])
+    assert "shifts" not in projection and day_offset == 0
+    projection, day_offset = server.schedule_sparse_projection(["monday_start", "friday_end"])
+    assert projection["shifts"] == 1 and day_offset == 0
+
+
+def test_sparse_schedule_view_reads_sliced_and_legacy_documents():
+    selected = ["service", "thursday_start", "thursday_end"]
+    sliced = {"service": "A", "shifts": [[480, None, None, 1440]]}
+    assert server.sparse_schedule_view(sliced, selected, 3) == {
+        "service": "A", "thursday_start": "08:00", "thursday_end": "24:00"
+    }
+    legacy = {"service": "A", "thursday_start": "8:00", "thursday_end": "8h"}
+    assert server.sparse_schedule_view(legacy, selected, 3) == {
+        "service": "A", "thursday_start": "08:00", "thursday_end": None
+    }
+    assert server.sparse_schedule_view({}, ["service"], 0) == {"service": None}
+
+
+@pytest.mark.parametrize("fields, day, time_fields", [
+    ("id,saturday_start,saturday_end", None, ["saturday_start", "saturday_end"]),
+    ("id,monday_end,sunday_start", None, ["monday_end", "sunday_start"]),
+    (None, "sunday", ["sunday_start", "sunday_break_start", "sunday_break_end", "sunday_end"]),
+])
+def test_schedule_read_matches_full_view(db, fields, day, time_fields):
+    document = {
+        "id": "s1",
+        "user_id": "u1",
+        "service": "A",
+        "created_at": server.datetime(2026, 1, 1),
+        "shifts": week(monday=[480, None, None, 1020], saturday=[1320, None, None, 360], sunday=[600, 720, 750, 900]),
+    }
+    full = server.schedule_view(document)
+    legacy = {**full, "id": "s2", "user_id": "u2"}
+
+    async def read():
+        await db.schedules.insert_many([document, legacy])
+        projection, build = server.schedule_read(fields, day and server.DayOfWeek(day))
+        return [build(found) async for found in db.schedules.find({}, projection).sort("id", 1)]
+
+    for view in asyncio.run(read()):
+        assert [field for field in view if field in server.SCHEDULE_TIME_POSITIONS] == time_fields
+        assert all(view[field] == full[field] for field in time_fields)
@@ -0,0 +1,15 @@
+import asyncio
+import hashlib
+
+import server
+
+
+def test_template_etag_hashes_the_served_bytes(monkeypatch):
+    monkeypatch.setattr(server, "template_cache", {})
+
+    async def fetch_twice():
+        return await server.get_template(), await server.get_template()
+
+    (etag, content), second = asyncio.run(fetch_twice())
+    assert etag == f'"{hashlib.sha256(content).hexdigest()[:32]}"'
+    assert second == (etag, content)
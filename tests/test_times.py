@@ -0,0 +1,52 @@
+from datetime import datetime, time
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import server
+
+
+@pytest.mark.parametrize("value, minutes", [
+    ("08:30", 510),
+    (" 7:05 ", 425),
+    ("24:00", 1440),
+    ("2024-01-01 07:45:00", 465),
+    (time(23, 59), 1439),
+    (None, None),
+    ("", None),
+    ("nan", None),
+])
+def test_parse_time_minutes(value, minutes):
+    assert server.parse_time_minutes(value) == minutes
+
+
+@pytest.mark.parametrize("value", ["25:00", "24:01", "08:60", "8h", "abc"])
+def test_parse_time_minutes_rejects_invalid_values(value):
+    with pytest.raises(ValueError, match="Invalid time"):
+        server.parse_time_minutes(value)
+
+
+def test_format_minutes_round_trips_labels():
+    assert server.format_minutes(5) == "00:05"
+    assert server.format_minutes(1440) == "24:00"
+    assert server.TIME_LABELS[510] == "08:30"
+
+
+def test_time_frame_to_minutes_parses_excel_cells():
+    frame = pd.DataFrame({
+        "time": ["08:00", time(8, 30), datetime(1900, 1, 1, 17, 15), "24:00"],
+        "fraction": [0.5, 0.25, 1.0, 0],
+        "empty": [None, np.nan, "", "nan"],
+    })
+    minutes = server.time_frame_to_minutes(frame)
+    assert minutes[:, 0].tolist() == [480, 510, 1035, 1440]
+    assert minutes[:, 1].tolist() == [720, 360, 1440, 0]
+    assert np.isnan(minutes[:, 2]).all()
+
+
+@pytest.mark.parametrize("value", ["25:00", "24:01", "08:60", "abc", 1.5, -0.1])
+def test_time_frame_to_minutes_rejects_invalid_cells(value):
+    frame = pd.DataFrame({"Lunes INICIO JORNADA": ["08:00", value]})
+    with pytest.raises(ValueError, match="Invalid time .* in column 'Lunes INICIO JORNADA'"):
+        server.time_frame_to_minutes(frame)
@@ -0,0 +1,23 @@
+import asyncio
+
+import pytest
+from fastapi import HTTPException
+
+import server
+
+
+def test_register_relies_on_the_unique_username_index(db):
+    user_data = server.UserCreate(
+        username="ana", email="ana@x", full_name="Ana", password="secreto", role="employee", service="A"
+    )
+
+    async def register_twice():
+        await server.ensure_indexes()
+        await server.register(user_data)
+        with pytest.raises(HTTPException) as error:
+            await server.register(user_data)
+        return error.value, await db.users.count_documents({"username": "ana"})
+
+    error, count = asyncio.run(register_twice())
+    assert (error.status_code, error.detail) == (400, "Username already registered")
+    assert count == 1